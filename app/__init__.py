@@ -1,7 +1,9 @@
+import json
 import os
+import tempfile
 
 from dotenv import load_dotenv
-from flask import Flask, render_template
+from flask import Flask, jsonify, render_template
 from flask_cors import CORS
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
@@ -23,14 +25,56 @@ def create_app():
     # Fallback to local MongoDB if MONGO_URI is not set
     app.config["MONGO_URI"] = os.getenv("MONGO_URI") or "mongodb://localhost:27017"
     app.config["JWT_SECRET"] = os.getenv("JWT_SECRET", "jwt-secret")
+    app.config["TOKEN_CACHE_SIZE"] = int(os.getenv("TOKEN_CACHE_SIZE", 4096))
+    app.config["TOKEN_CACHE_TTL"] = float(os.getenv("TOKEN_CACHE_TTL", 300))
+    app.config["BCRYPT_ROUNDS"] = int(os.getenv("BCRYPT_ROUNDS", 12))
+    app.config["BCRYPT_WORKERS"] = int(os.getenv("BCRYPT_WORKERS", 2))
+    app.config["BCRYPT_QUEUE_DEPTH"] = int(os.getenv("BCRYPT_QUEUE_DEPTH", 8))
+    app.config["BCRYPT_TIMEOUT"] = float(os.getenv("BCRYPT_TIMEOUT", 10))
+    # Concurrent hashes across all worker processes on this host (0 = per-process pool only)
+    app.config["BCRYPT_HOST_SLOTS"] = int(os.getenv("BCRYPT_HOST_SLOTS", 2))
+    app.config["BCRYPT_HOST_WAIT"] = float(os.getenv("BCRYPT_HOST_WAIT", 1))
+    app.config["BCRYPT_LOCK_DIR"] = os.getenv("BCRYPT_LOCK_DIR") or os.path.join(tempfile.gettempdir(), "urban-pulse-bcrypt")
     app.config["CLOUDINARY_URL"] = os.getenv("CLOUDINARY_URL", "")
+    # Side-effect job queue: "thread" in production, "inline" runs jobs synchronously (tests)
+    app.config["JOBS_MODE"] = os.getenv("JOBS_MODE", "thread")
+    app.config["JOBS_WORKERS"] = int(os.getenv("JOBS_WORKERS", 2))
+    app.config["JOBS_QUEUE_SIZE"] = int(os.getenv("JOBS_QUEUE_SIZE", 10000))
+    app.config["JOBS_MAX_RETRIES"] = int(os.getenv("JOBS_MAX_RETRIES", 3))
+    # Global impact totals are $inc'd into this many counter documents
+    app.config["IMPACT_AGGREGATE_SHARDS"] = int(os.getenv("IMPACT_AGGREGATE_SHARDS", 1))
+    # Impact models: newest impact_models document, or a JSON file; polled for changes
+    app.config["IMPACT_MODELS_FILE"] = os.getenv("IMPACT_MODELS_FILE", "")
+    app.config["IMPACT_MODEL_RELOAD_INTERVAL"] = float(os.getenv("IMPACT_MODEL_RELOAD_INTERVAL", 60))
+    # Optional in-memory grid index of open issues for nearby queries
+    app.config["SPATIAL_INDEX_ENABLED"] = os.getenv("SPATIAL_INDEX_ENABLED", "false").lower() == "true"
+    app.config["SPATIAL_INDEX_CELL_DEG"] = float(os.getenv("SPATIAL_INDEX_CELL_DEG", 0.01))
+    app.config["SPATIAL_INDEX_REFRESH"] = float(os.getenv("SPATIAL_INDEX_REFRESH", 30))
+    app.config["SPATIAL_INDEX_REBUILD"] = float(os.getenv("SPATIAL_INDEX_REBUILD", 600))
+    # Hotspot clustering: per-endpoint overrides as JSON, e.g. {"nearby": {"eps_m": 300}}
+    app.config["HOTSPOT_PROFILES"] = json.loads(os.getenv("HOTSPOT_PROFILES") or "{}")
+    app.config["HOTSPOT_MAX_AGE"] = float(os.getenv("HOTSPOT_MAX_AGE", 900))
+    app.config["HOTSPOT_WORKERS"] = int(os.getenv("HOTSPOT_WORKERS", 2))
+    # Closed issues older than this many days are left out of the clustering
+    app.config["HOTSPOT_WINDOW_DAYS"] = float(os.getenv("HOTSPOT_WINDOW_DAYS", 365))
+    # Buffered audit writer; AUDIT_STRICT=true writes every entry immediately
+    app.config["AUDIT_BATCH_SIZE"] = int(os.getenv("AUDIT_BATCH_SIZE", 200))
+    app.config["AUDIT_FLUSH_INTERVAL"] = float(os.getenv("AUDIT_FLUSH_INTERVAL", 1.0))
+    app.config["AUDIT_STRICT"] = os.getenv("AUDIT_STRICT", "false").lower() == "true"
+    # IANA timezone whose calendar days the issue trends are bucketed by
+    app.config["CITY_TIMEZONE"] = os.getenv("CITY_TIMEZONE", "UTC")
+
+    from .utils.pagination import CursorError
+    from .utils.security import HashingBusyError, init_security
+    init_security(app)
     
     # Enable CORS
     CORS(app, resources={
         r"/api/*": {
             "origins": "*",
             "methods": ["GET", "POST", "PUT", "DELETE"],
-            "allow_headers": ["Content-Type", "Authorization"]
+            "allow_headers": ["Content-Type", "Authorization"],
+            "expose_headers": ["X-Next-Cursor", "Link"]
         }
     })
     
@@ -120,6 +164,24 @@ def create_app():
     from .routes.bulk import bulk_bp
     app.register_blueprint(bulk_bp, url_prefix="/api/bulk")
 
+    # Background side effects; handler modules register their jobs on import
+    from .utils import email, hotspots, impact_engine, map_grid, subscriptions, trends, versions  # noqa: F401
+    from .utils.jobs import init_jobs
+    init_jobs(app)
+
+    from .utils.impact_engine import init_impact
+    from .utils.impact_models import init_impact_models
+    init_impact(app)
+    init_impact_models(app)
+    hotspots.init_hotspots(app)
+    trends.init_trends(app)
+
+    from .utils.audit import AuditWriteError, init_audit
+    init_audit(app)
+
+    from .utils.spatial_index import init_spatial_index
+    init_spatial_index(app)
+
     # Public views
     from .routes.views import views_bp
 
@@ -134,6 +196,18 @@ def create_app():
     def internal_server_error(e):
         return render_template("500.html"), 500
 
+    @app.errorhandler(CursorError)
+    def bad_cursor(e):
+        return jsonify({"error": str(e)}), 400
+
+    @app.errorhandler(AuditWriteError)
+    def audit_write_failed(e):
+        return jsonify({"error": "The change was saved but its audit log entry could not be written yet"}), 500
+
+    @app.errorhandler(HashingBusyError)
+    def hashing_busy(e):
+        return jsonify({"error": "Server busy, please retry shortly"}), 503, {"Retry-After": "1"}
+
     return app
 
 
@@ -1,12 +1,38 @@
+import os
 from functools import wraps
 
 from bson import ObjectId
 from flask import request, jsonify, g
 
 from .. import db
+from ..utils.cache import TTLCache
+from ..utils.results import invalidate_results
 from ..utils.security import decode_token
 
 
+# Authenticated users keyed by id; saves a users lookup on every API call.
+user_cache = TTLCache(
+    maxsize=int(os.getenv("USER_CACHE_SIZE", 2048)),
+    ttl=float(os.getenv("USER_CACHE_TTL", 60)),
+)
+
+
+def invalidate_user(user_id):
+    """Drop a cached user, and the cached results built from users, after their document changes."""
+    user_cache.invalidate(str(user_id))
+    invalidate_results("users")
+
+
+def load_user(user_id: str):
+    user = user_cache.get(user_id)
+    if user is None:
+        user = db.users.find_one({"_id": ObjectId(user_id)})
+        if user:
+            user_cache.set(user_id, user)
+    # Hand out a copy so request handlers never mutate the cached document
+    return dict(user) if user else None
+
+
 def auth_required(roles=None):
     def decorator(fn):
         @wraps(fn)
@@ -21,7 +47,7 @@ def auth_required(roles=None):
             except Exception:
                 return jsonify({"error": "Invalid or expired token"}), 401
 
-            user = db.users.find_one({"_id": ObjectId(payload["sub"])})
+            user = load_user(payload["sub"])
             if not user:
                 return jsonify({"error": "User not found"}), 401
 
@@ -34,5 +60,3 @@ def auth_required(roles=None):
         return wrapper
 
     return decorator
-
-
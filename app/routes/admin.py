@@ -2,21 +2,42 @@ from datetime import datetime
 from math import sqrt
 
 from bson import ObjectId
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, jsonify, request, g
 
 from .. import db
-from ..middleware.auth import auth_required
+from ..middleware.auth import auth_required, user_cache
+from ..utils.lifecycle import TransitionError, transition_issue
+from ..utils.pagination import paginate_request, page_response
+from ..utils.hotspots import stored_hotspots
+from ..utils.results import result_cache
+from ..utils.security import token_cache_stats
+from ..utils.spatial_index import spatial_index_stats
+from ..utils.stats import user_role_counts
+from .issues import add_audit_log
 
 
 admin_bp = Blueprint("admin", __name__)
 
+ADMIN_ISSUE_FIELDS = {
+    "title": 1,
+    "category": 1,
+    "description": 1,
+    "imageUrl": 1,
+    "status": 1,
+    "location": 1,
+    "assignedTo": 1,
+    "createdAt": 1,
+    "updatedAt": 1,
+}
+
 
 @admin_bp.get("/all-issues")
 @auth_required(roles=["admin"])
 def all_issues():
     """Get all issues for admin dashboard."""
+    docs, next_cursor = paginate_request(db.issues, {}, "createdAt", ADMIN_ISSUE_FIELDS)
     issues = []
-    for doc in db.issues.find({}).sort("createdAt", -1):
+    for doc in docs:
         issues.append({
             "_id": str(doc["_id"]),
             "title": doc.get("title"),
@@ -29,7 +50,7 @@ def all_issues():
             "createdAt": doc.get("createdAt").isoformat() if doc.get("createdAt") else None,
             "updatedAt": doc.get("updatedAt").isoformat() if doc.get("updatedAt") else None,
         })
-    return jsonify(issues)
+    return page_response(issues, next_cursor)
 
 
 @admin_bp.get("/users")
@@ -61,39 +82,39 @@ def assign_issue():
         return jsonify({"error": "Missing issueId or workerId"}), 400
     
     try:
-        result = db.issues.update_one(
-            {"_id": ObjectId(issue_id)},
-            {
-                "$set": {
-                    "assignedTo": ObjectId(worker_id),
-                    "status": "ASSIGNED",
-                    "updatedAt": datetime.utcnow()
-                }
-            }
-        )
-        
-        if result.matched_count == 0:
-            return jsonify({"error": "Issue not found"}), 404
-        
-        return jsonify({"message": "Issue assigned successfully"})
+        issue = transition_issue(issue_id, "ASSIGNED", set_fields={"assignedTo": ObjectId(worker_id)})
+    except TransitionError as e:
+        return jsonify({"error": str(e)}), e.status_code
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+    add_audit_log(issue["_id"], "ASSIGNED", g.current_user["_id"], strict=True)
+    return jsonify({"message": "Issue assigned successfully"})
+
 
 @admin_bp.get("/user-stats")
 @auth_required(roles=["admin"])
 def user_stats():
     """Get user statistics."""
-    total_users = db.users.count_documents({})
-    citizens = db.users.count_documents({"role": "citizen"})
-    workers = db.users.count_documents({"role": "worker"})
-    admins = db.users.count_documents({"role": "admin"})
+    counts = user_role_counts()
     
     return jsonify({
-        "total": total_users,
-        "citizens": citizens,
-        "workers": workers,
-        "admins": admins
+        "total": counts["total"],
+        "citizens": counts["citizen"],
+        "workers": counts["worker"],
+        "admins": counts["admin"]
+    })
+
+
+@admin_bp.get("/cache-stats")
+@auth_required(roles=["admin"])
+def cache_stats():
+    """Hit/miss counters and sizes of the process-local caches, for sizing."""
+    return jsonify({
+        "users": user_cache.stats(),
+        "tokens": token_cache_stats(),
+        "results": result_cache.stats(),
+        "spatialIndex": spatial_index_stats(),
     })
 
 
@@ -150,30 +171,18 @@ def list_workers():
 @admin_bp.get("/recurring-issues")
 @auth_required(roles=["admin"])
 def recurring_issues():
-    # naive structural problem detection: same lat/lng rounded to 3 decimals and count > 3
-    issues = list(db.issues.find({}))
-    buckets = {}
-    for i in issues:
-        loc = i.get("location") or {}
-        lat = loc.get("lat")
-        lng = loc.get("lng")
-        if lat is None or lng is None:
-            continue
-        key = (round(float(lat), 3), round(float(lng), 3))
-        buckets.setdefault(key, []).append(i)
-
+    # Structural problems: dense clusters from the precomputed "recurring" profile
     structural = []
-    for (lat, lng), group in buckets.items():
-        if len(group) > 3:
-            structural.append(
-                {
-                    "lat": lat,
-                    "lng": lng,
-                    "count": len(group),
-                    "issueIds": [str(g["_id"]) for g in group],
-                    "label": "STRUCTURAL PROBLEM",
-                }
-            )
+    for spot in stored_hotspots("recurring"):
+        structural.append(
+            {
+                "lat": round(spot["center"]["lat"], 5),
+                "lng": round(spot["center"]["lng"], 5),
+                "count": spot["issueCount"],
+                "issueIds": [str(i) for i in spot["issueIds"]],
+                "label": "STRUCTURAL PROBLEM",
+            }
+        )
     return jsonify(structural)
 
 
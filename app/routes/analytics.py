@@ -1,108 +1,60 @@
-import csv
-import io
 from datetime import datetime, timedelta
+from itertools import islice
 from bson import ObjectId
-from flask import Blueprint, jsonify, request, Response, g
+from flask import Blueprint, Response, jsonify, request, g, stream_with_context
 
 from .. import db
 from ..middleware.auth import auth_required
+from ..utils.columnar import DATASETS, FORMATS, iter_export
+from ..utils.hotspots import stored_hotspots
+from ..utils.impact_engine import read_global_aggregates
+from ..utils.pagination import after_cursor, encode_cursor
+from ..utils.results import cached_result
+from ..utils.stats import issue_stats, user_role_counts
+from ..utils.streaming import stream_csv
+from ..utils.trends import GRANULARITIES, issue_trends
 
 analytics_bp = Blueprint("analytics", __name__)
 
+# Export rows per Mongo batch, users lookup and flushed CSV chunk
+EXPORT_CHUNK_SIZE = 1000
+EXPORT_FIELDS = {"title": 1, "category": 1, "status": 1, "reportedBy": 1, "createdAt": 1, "updatedAt": 1, "location": 1}
+EXPORT_MIMETYPES = {"parquet": "application/vnd.apache.parquet", "arrow": "application/vnd.apache.arrow.stream"}
+EXPORT_HEADER = [
+    "ID", "Title", "Category", "Status", "Reporter Email",
+    "Created At", "Updated At", "Location", "Cursor"
+]
+
 @analytics_bp.get("/dashboard-stats")
 @auth_required(roles=["admin"])
 def get_dashboard_stats():
-    """Comprehensive dashboard statistics"""
-    
-    # Time ranges
-    now = datetime.utcnow()
-    today_start = datetime(now.year, now.month, now.day)
-    week_start = now - timedelta(days=7)
-    month_start = now - timedelta(days=30)
-    
-    # Total counts
-    total_issues = db.issues.count_documents({})
-    total_users = db.users.count_documents({})
-    total_citizens = db.users.count_documents({"role": "citizen"})
-    total_workers = db.users.count_documents({"role": "worker"})
-    
-    # Status breakdown
-    status_counts = {}
-    for status in ["REPORTED", "VERIFIED", "ASSIGNED", "IN_PROGRESS", "RESOLVED", "CLOSED"]:
-        status_counts[status] = db.issues.count_documents({"status": status})
-    
-    # Category breakdown
-    category_pipeline = [
-        {"$group": {"_id": "$category", "count": {"$sum": 1}}},
-        {"$sort": {"count": -1}}
-    ]
-    categories = list(db.issues.aggregate(category_pipeline))
-    
-    # Time-based metrics
-    today_issues = db.issues.count_documents({"createdAt": {"$gte": today_start}})
-    week_issues = db.issues.count_documents({"createdAt": {"$gte": week_start}})
-    month_issues = db.issues.count_documents({"createdAt": {"$gte": month_start}})
-    
-    # Resolution metrics
-    resolved_count = db.issues.count_documents({"status": {"$in": ["RESOLVED", "CLOSED"]}})
-    resolution_rate = (resolved_count / total_issues * 100) if total_issues > 0 else 0
-    
-    # Average resolution time
-    avg_resolution_pipeline = [
-        {"$match": {"status": {"$in": ["RESOLVED", "CLOSED"]}}},
-        {
-            "$project": {
-                "resolutionTime": {
-                    "$subtract": ["$updatedAt", "$createdAt"]
-                }
-            }
-        },
-        {
-            "$group": {
-                "_id": None,
-                "avgTime": {"$avg": "$resolutionTime"}
-            }
-        }
-    ]
-    avg_result = list(db.issues.aggregate(avg_resolution_pipeline))
-    avg_resolution_hours = (avg_result[0]["avgTime"] / (1000 * 60 * 60)) if avg_result else 0
-    
-    # Top contributors
-    top_reporters_pipeline = [
-        {"$group": {"_id": "$reportedBy", "count": {"$sum": 1}}},
-        {"$sort": {"count": -1}},
-        {"$limit": 5}
-    ]
-    top_reporters_data = list(db.issues.aggregate(top_reporters_pipeline))
-    top_reporters = []
-    for item in top_reporters_data:
-        user = db.users.find_one({"_id": item["_id"]})
-        if user:
-            top_reporters.append({
-                "name": user["name"],
-                "count": item["count"]
-            })
+    """Comprehensive dashboard statistics: one aggregation over issues, one over users"""
+    
+    issues = issue_stats(["categories", "windows", "resolution", "topReporters"])
+    users = user_role_counts()
+    total_issues = issues["total"]
+    resolution_rate = (issues["resolved"] / total_issues * 100) if total_issues > 0 else 0
     
     # Impact metrics
-    impact_totals = db.global_aggregates.find_one() or {}
+    impact_totals = read_global_aggregates()
     
     return jsonify({
         "overview": {
             "totalIssues": total_issues,
-            "totalUsers": total_users,
-            "totalCitizens": total_citizens,
-            "totalWorkers": total_workers,
+            "totalUsers": users["total"],
+            "totalCitizens": users["citizen"],
+            "totalWorkers": users["worker"],
             "resolutionRate": round(resolution_rate, 2),
-            "avgResolutionHours": round(avg_resolution_hours, 2)
+            "avgResolutionHours": round(issues["avgResolutionHours"], 2)
         },
         "timeMetrics": {
-            "today": today_issues,
-            "thisWeek": week_issues,
-            "thisMonth": month_issues
+            "today": issues["windows"]["today"],
+            "thisWeek": issues["windows"]["week"],
+            "thisMonth": issues["windows"]["month"]
         },
-        "statusBreakdown": status_counts,
-        "categoryBreakdown": [{"category": c["_id"], "count": c["count"]} for c in categories],
-        "topReporters": top_reporters,
+        "statusBreakdown": issues["statuses"],
+        "categoryBreakdown": issues["categories"],
+        "topReporters": [{"name": r["name"], "count": r["count"]} for r in issues["topReporters"]],
         "impact": {
             "waterSaved": impact_totals.get("totalWaterSaved", 0),
             "co2Reduced": impact_totals.get("totalCo2Reduced", 0),
@@ -111,114 +63,141 @@ def get_dashboard_stats():
     })
 
 @analytics_bp.get("/trends")
+@cached_result("issues")
 def get_trends():
-    """Get issue trends over time"""
-    days = int(request.args.get("days", 30))
+    """Get issue trends over time
     
-    start_date = datetime.utcnow() - timedelta(days=days)
-    
-    pipeline = [
-        {"$match": {"createdAt": {"$gte": start_date}}},
-        {
-            "$group": {
-                "_id": {
-                    "$dateToString": {
-                        "format": "%Y-%m-%d",
-                        "date": "$createdAt"
-                    }
-                },
-                "count": {"$sum": 1}
-            }
-        },
-        {"$sort": {"_id": 1}}
-    ]
+    ?days=30&granularity=day|week|month, optional category and status; days
+    are calendar days in CITY_TIMEZONE. Served from the daily_counts rollup.
+    """
+    days = int(request.args.get("days", 30))
+    granularity = request.args.get("granularity", "day")
+    if granularity not in GRANULARITIES:
+        return jsonify({"error": "granularity must be day, week or month"}), 400
     
-    trends = list(db.issues.aggregate(pipeline))
+    trends = issue_trends(days, granularity, request.args.get("category"), request.args.get("status"))
     
-    return jsonify([{"date": t["_id"], "count": t["count"]} for t in trends])
+    return jsonify(trends)
 
 @analytics_bp.get("/export/issues")
 @auth_required(roles=["admin"])
 def export_issues_csv():
-    """Export issues to CSV"""
+    """Export issues to CSV, streamed newest first
+    
+    Filters: status, category, and from/to on createdAt (ISO dates or
+    datetimes, both inclusive). The last column of every row is a cursor:
+    an interrupted export resumes with ?cursor=<last row's cursor> (same
+    filters), which returns the remaining rows without the header. The
+    body is gzip-compressed for clients that accept it.
+    
+    format=parquet or format=arrow returns the typed columnar export instead.
+    """
+    
+    if request.args.get("format", "csv") != "csv":
+        return export_columnar("issues")
     
     # Query parameters
     status = request.args.get("status")
     category = request.args.get("category")
+    cursor = request.args.get("cursor")
     
-    query = {}
+    try:
+        query = DATASETS["issues"].time_query(*_date_bounds(request.args.get("from"), request.args.get("to")))
+    except ValueError:
+        return jsonify({"error": "Invalid from/to date"}), 400
     if status:
         query["status"] = status
     if category:
         query["category"] = category
     
-    # Create CSV in memory
-    output = io.StringIO()
-    writer = csv.writer(output)
-    
-    # Write header
-    writer.writerow([
-        "ID", "Title", "Category", "Status", "Reporter Email",
-        "Created At", "Updated At", "Location"
-    ])
-    
-    # Write data
-    for issue in db.issues.find(query).sort("createdAt", -1):
-        reporter = db.users.find_one({"_id": issue["reportedBy"]})
-        reporter_email = reporter["email"] if reporter else "Unknown"
-        
-        writer.writerow([
-            str(issue["_id"]),
-            issue["title"],
-            issue["category"],
-            issue["status"],
-            reporter_email,
-            issue["createdAt"].strftime("%Y-%m-%d %H:%M:%S"),
-            issue["updatedAt"].strftime("%Y-%m-%d %H:%M:%S"),
-            issue["location"].get("address", "")
-        ])
-    
-    # Create response
-    output.seek(0)
+    issues = (
+        db.issues.find(after_cursor(query, "createdAt", cursor), EXPORT_FIELDS)
+        .sort([("createdAt", -1), ("_id", -1)])
+        .batch_size(EXPORT_CHUNK_SIZE)
+    )
+    
+    def chunks():
+        if not cursor:
+            yield [EXPORT_HEADER]
+        while True:
+            batch = list(islice(issues, EXPORT_CHUNK_SIZE))
+            if not batch:
+                return
+            # One users query per chunk instead of one per row
+            reporter_ids = list({issue.get("reportedBy") for issue in batch})
+            emails = {u["_id"]: u.get("email") for u in db.users.find({"_id": {"$in": reporter_ids}}, {"email": 1})}
+            yield [[
+                str(issue["_id"]),
+                issue["title"],
+                issue["category"],
+                issue["status"],
+                emails.get(issue.get("reportedBy")) or "Unknown",
+                issue["createdAt"].strftime("%Y-%m-%d %H:%M:%S"),
+                issue["updatedAt"].strftime("%Y-%m-%d %H:%M:%S"),
+                (issue.get("location") or {}).get("address", ""),
+                encode_cursor(issue["createdAt"], issue["_id"])
+            ] for issue in batch]
+    
+    return stream_csv(
+        chunks(),
+        f"issues_export_{datetime.now().strftime('%Y%m%d')}.csv",
+        compress="gzip" in request.accept_encodings
+    )
+
+@analytics_bp.get("/export/<dataset>")
+@auth_required(roles=["admin"])
+def export_columnar(dataset):
+    """Typed Parquet (default) or Arrow IPC stream export of issues, audit-logs or impact-metrics
+    
+    Built and streamed one record batch at a time; from/to filter on the
+    dataset's timestamp like the CSV export, and issues also take the CSV
+    export's status and category filters.
+    """
+    spec = DATASETS.get(dataset.replace("-", "_"))
+    if spec is None:
+        return jsonify({"error": "Unknown dataset"}), 404
+    fmt = request.args.get("format", "parquet")
+    if fmt not in FORMATS:
+        return jsonify({"error": "format must be parquet or arrow"}), 400
+    try:
+        query = spec.time_query(*_date_bounds(request.args.get("from"), request.args.get("to")))
+    except ValueError:
+        return jsonify({"error": "Invalid from/to date"}), 400
+    for field in spec.filters:
+        if request.args.get(field):
+            query[field] = request.args[field]
+    
+    filename = f"{spec.collection}_export_{datetime.now().strftime('%Y%m%d')}{FORMATS[fmt]}"
     return Response(
-        output.getvalue(),
-        mimetype="text/csv",
-        headers={"Content-Disposition": f"attachment;filename=issues_export_{datetime.now().strftime('%Y%m%d')}.csv"}
+        stream_with_context(iter_export(db, spec, fmt, query)),
+        mimetype=EXPORT_MIMETYPES[fmt],
+        headers={"Content-Disposition": f"attachment;filename={filename}"}
     )
 
+def _date_bounds(start: str, end: str):
+    """(start, exclusive end) for inclusive from/to; a date-only `end` covers that whole day."""
+    lower = datetime.fromisoformat(start) if start else None
+    upper = None
+    if end:
+        step = timedelta(days=1) if len(end) == 10 else timedelta(milliseconds=1)  # Mongo dates are ms
+        upper = datetime.fromisoformat(end) + step
+    return lower, upper
+
 @analytics_bp.get("/hotspots")
 @auth_required(roles=["admin"])
 def get_hotspots():
     """Identify recurring issue hotspots"""
     
-    # Group by location (approximate)
-    pipeline = [
-        {
-            "$group": {
-                "_id": {
-                    "lat": {"$round": [{"$multiply": ["$location.lat", 100]}, 0]},
-                    "lng": {"$round": [{"$multiply": ["$location.lng", 100]}, 0]}
-                },
-                "count": {"$sum": 1},
-                "issues": {"$push": {"title": "$title", "category": "$category"}}
-            }
-        },
-        {"$match": {"count": {"$gte": 2}}},
-        {"$sort": {"count": -1}},
-        {"$limit": 10}
-    ]
-    
-    hotspots = list(db.issues.aggregate(pipeline))
-    
+    # Precomputed clusters ("analytics" profile), refreshed in the background
     result = []
-    for spot in hotspots:
+    for spot in stored_hotspots("analytics"):
         result.append({
             "location": {
-                "lat": spot["_id"]["lat"] / 100,
-                "lng": spot["_id"]["lng"] / 100
+                "lat": round(spot["center"]["lat"], 5),
+                "lng": round(spot["center"]["lng"], 5)
             },
-            "issueCount": spot["count"],
-            "recentIssues": spot["issues"][:3]
+            "issueCount": spot["issueCount"],
+            "recentIssues": spot["recentIssues"]
         })
     
     return jsonify(result)
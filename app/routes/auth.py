@@ -4,9 +4,18 @@ from bson import ObjectId
 from flask import Blueprint, jsonify, request, g
 
 from .. import db
-from ..middleware.auth import auth_required
-from ..utils.security import hash_password, verify_password, create_access_token
-from ..utils.email import send_email
+from ..middleware.auth import auth_required, invalidate_user
+from ..utils.security import (
+    hash_password,
+    verify_password,
+    needs_rehash,
+    rehash_password_async,
+    create_access_token,
+    get_jwt_secret,
+)
+from ..utils.jobs import enqueue
+from ..utils.results import invalidate_results
+from .notifications import invalidate_admin_ids
 import jwt
 import os
 
@@ -39,12 +48,16 @@ def register():
         "createdAt": datetime.utcnow(),
     }
     res = db.users.insert_one(user_doc)
+    invalidate_results("users")
+    if role == "admin":
+        invalidate_admin_ids()
     user_id = str(res.inserted_id)
     user_id = str(res.inserted_id)
     token = create_access_token(user_id, role)
     
     # Send Welcome Email
-    send_email(
+    enqueue(
+        "email",
         email, 
         "Welcome to Urban Pulse!", 
         f"Hi {name},<br><br>Welcome to Urban Pulse! We're excited to have you join our community of changemakers.<br><br>Start reporting issues and making an impact today!<br><br>Best,<br>The Urban Pulse Team"
@@ -53,6 +66,19 @@ def register():
     return jsonify({"token": token, "user": {"id": user_id, "name": name, "email": email, "role": role}}), 201
 
 
+def _upgrade_password_hash(user, password):
+    """Re-hash at the configured cost in the background after a good login."""
+    def save(new_hash):
+        # Only replace the hash we verified, never a concurrently changed one
+        db.users.update_one(
+            {"_id": user["_id"], "password": user["password"]},
+            {"$set": {"password": new_hash}},
+        )
+        invalidate_user(user["_id"])
+
+    rehash_password_async(password, save)
+
+
 @auth_bp.post("/login")
 def login():
     data = request.get_json() or {}
@@ -66,6 +92,9 @@ def login():
     if not user or not verify_password(password, user["password"]):
         return jsonify({"error": "Invalid credentials"}), 401
 
+    if needs_rehash(user["password"]):
+        _upgrade_password_hash(user, password)
+
     user_id = str(user["_id"])
     token = create_access_token(user_id, user["role"])
     return jsonify(
@@ -111,14 +140,15 @@ def forgot_password():
     # Generate reset token (1 hour expiry)
     reset_token = jwt.encode(
         {"id": str(user["_id"]), "role": user["role"], "exp": datetime.utcnow().timestamp() + 3600, "type": "reset"},
-        os.getenv("JWT_SECRET"),
+        get_jwt_secret(),
         algorithm="HS256"
     )
     
     app_url = os.getenv("APP_URL", "http://localhost:5000")
     link = f"{app_url}/reset-password?token={reset_token}"
     
-    send_email(
+    enqueue(
+        "email",
         email,
         "Reset Your Password",
         f"Hi {user['name']},<br><br>Click the link below to reset your password:<br><a href='{link}'>Reset Password</a><br><br>This link expires in 1 hour."
@@ -137,7 +167,7 @@ def reset_password():
         return jsonify({"error": "Missing fields"}), 400
         
     try:
-        payload = jwt.decode(token, os.getenv("JWT_SECRET"), algorithms=["HS256"])
+        payload = jwt.decode(token, get_jwt_secret(), algorithms=["HS256"])
         if payload.get("type") != "reset":
             return jsonify({"error": "Invalid token type"}), 400
             
@@ -145,6 +175,7 @@ def reset_password():
         hashed = hash_password(new_password)
         
         db.users.update_one({"_id": ObjectId(user_id)}, {"$set": {"password": hashed}})
+        invalidate_user(user_id)
         
         return jsonify({"message": "Password updated successfully"}), 200
         
@@ -166,6 +197,7 @@ def update_profile():
     
     if update:
         db.users.update_one({"_id": user["_id"]}, {"$set": update})
+        invalidate_user(user["_id"])
         
     return jsonify({"message": "Profile updated successfully"})
 
@@ -189,6 +221,7 @@ def change_password():
         
     hashed = hash_password(new_pass)
     db.users.update_one({"_id": user["_id"]}, {"$set": {"password": hashed}})
+    invalidate_user(user["_id"])
     
     return jsonify({"message": "Password updated successfully"})
 
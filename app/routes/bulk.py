@@ -1,9 +1,15 @@
-from datetime import datetime
 from bson import ObjectId
 from flask import Blueprint, jsonify, request, g
+from pymongo.errors import PyMongoError
 
 from .. import db
 from ..middleware.auth import auth_required
+from ..utils.audit import flush_audit
+from ..utils.impact_engine import remove_impact
+from ..utils.jobs import enqueue
+from ..utils.lifecycle import TransitionError, issue_deleted, transition_issue
+from .issues import add_audit_log, award_points
+from .notifications import notify, notify_many
 
 bulk_bp = Blueprint("bulk", __name__)
 
@@ -23,43 +29,23 @@ def bulk_verify():
     
     for issue_id in issue_ids:
         try:
-            oid = ObjectId(issue_id)
-            result = db.issues.update_one(
-                {"_id": oid, "status": "REPORTED"},
-                {
-                    "$set": {
-                        "status": "VERIFIED",
-                        "updatedAt": datetime.utcnow()
-                    }
-                }
-            )
-            
-            if result.modified_count > 0:
-                verified_count += 1
-                
-                # Add audit log
-                db.audit_logs.insert_one({
-                    "issueId": oid,
-                    "action": "VERIFIED",
-                    "performedBy": g.current_user["_id"],
-                    "timestamp": datetime.utcnow()
-                })
-                
-                # Notify reporter
-                issue = db.issues.find_one({"_id": oid})
-                if issue:
-                    from .notifications import create_notification
-                    create_notification(
-                        issue["reportedBy"],
-                        "info",
-                        "Issue Verified",
-                        f"Your issue '{issue['title']}' has been verified"
-                    )
-            else:
-                failed.append(issue_id)
-                
-        except Exception as e:
+            issue = transition_issue(issue_id, "VERIFIED")
+        except (TransitionError, PyMongoError):  # bad ids surface as TransitionError
             failed.append(issue_id)
+            continue
+
+        verified_count += 1
+
+        add_audit_log(issue["_id"], "VERIFIED", g.current_user["_id"])
+
+        # Notify reporter
+        notify(
+            issue["reportedBy"],
+            "info",
+            "Issue Verified",
+            f"Your issue '{issue['title']}' has been verified"
+        )
+    flush_audit(strict=True)  # one batched insert for the whole request
     
     return jsonify({
         "verified": verified_count,
@@ -89,55 +75,44 @@ def bulk_assign():
     if not worker:
         return jsonify({"error": "Worker not found"}), 400
     
-    assigned_count = 0
+    assigned = []
     failed = []
     
     for issue_id in issue_ids:
         try:
-            oid = ObjectId(issue_id)
-            result = db.issues.update_one(
-                {"_id": oid, "status": {"$in": ["VERIFIED", "REPORTED"]}},
-                {
-                    "$set": {
-                        "assignedTo": wid,
-                        "status": "ASSIGNED",
-                        "updatedAt": datetime.utcnow()
-                    }
-                }
+            issue = transition_issue(
+                issue_id, "ASSIGNED", set_fields={"assignedTo": wid}, from_states=["VERIFIED", "REPORTED"]
             )
-            
-            if result.modified_count > 0:
-                assigned_count += 1
-                
-                # Add audit log
-                db.audit_logs.insert_one({
-                    "issueId": oid,
-                    "action": "ASSIGNED",
-                    "performedBy": g.current_user["_id"],
-                    "timestamp": datetime.utcnow()
-                })
-                
-                # Notify worker and reporter
-                issue = db.issues.find_one({"_id": oid})
-                if issue:
-                    from .notifications import create_notification
-                    create_notification(
-                        wid,
-                        "info",
-                        "New Task Assigned",
-                        f"You have been assigned: {issue['title']}"
-                    )
-                    create_notification(
-                        issue["reportedBy"],
-                        "info",
-                        "Issue Assigned",
-                        f"A worker has been assigned to your issue"
-                    )
-            else:
-                failed.append(issue_id)
-                
-        except Exception as e:
+        except (TransitionError, PyMongoError):
             failed.append(issue_id)
+            continue
+
+        assigned.append(issue)
+        add_audit_log(issue["_id"], "ASSIGNED", g.current_user["_id"])
+    flush_audit(strict=True)
+
+    # Notify worker and reporters, one batch each
+    if len(assigned) == 1:
+        notify(
+            wid,
+            "info",
+            "New Task Assigned",
+            f"You have been assigned: {assigned[0]['title']}"
+        )
+    elif assigned:
+        notify(
+            wid,
+            "info",
+            "New Tasks Assigned",
+            f"You have been assigned {len(assigned)} new tasks"
+        )
+    notify_many(
+        [issue["reportedBy"] for issue in assigned],
+        "info",
+        "Issue Assigned",
+        f"A worker has been assigned to your issue"
+    )
+    assigned_count = len(assigned)
     
     return jsonify({
         "assigned": assigned_count,
@@ -161,56 +136,30 @@ def bulk_close():
     
     for issue_id in issue_ids:
         try:
-            oid = ObjectId(issue_id)
-            issue = db.issues.find_one({"_id": oid})
-            
-            if not issue or issue["status"] != "RESOLVED":
-                failed.append(issue_id)
-                continue
-            
-            # Update status
-            db.issues.update_one(
-                {"_id": oid},
-                {
-                    "$set": {
-                        "status": "CLOSED",
-                        "updatedAt": datetime.utcnow()
-                    }
-                }
-            )
-            
-            closed_count += 1
-            
-            # Add audit log
-            db.audit_logs.insert_one({
-                "issueId": oid,
-                "action": "CLOSED",
-                "performedBy": g.current_user["_id"],
-                "timestamp": datetime.utcnow()
-            })
-            
-            # Calculate and persist impact
-            from ..utils.impact_engine import calculate_impact, persist_impact
-            impact = calculate_impact(issue, datetime.utcnow())
-            persist_impact(oid, impact, issue.get("reportedBy"))
-            
-            # Award points
-            db.users.update_one(
-                {"_id": issue["reportedBy"]},
-                {"$inc": {"points": 20}}
-            )
-            
-            # Notify reporter
-            from .notifications import create_notification
-            create_notification(
-                issue["reportedBy"],
-                "success",
-                "Issue Closed",
-                "Your issue has been closed and points awarded!"
-            )
-            
-        except Exception as e:
+            issue = transition_issue(issue_id, "CLOSED")
+        except (TransitionError, PyMongoError):
             failed.append(issue_id)
+            continue
+
+        oid = issue["_id"]
+        closed_count += 1
+
+        add_audit_log(oid, "CLOSED", g.current_user["_id"])
+
+        # Calculate and persist impact
+        enqueue("impact", issue, issue["closedAt"])
+
+        # Award points
+        award_points(issue["reportedBy"], 20)
+
+        # Notify reporter
+        notify(
+            issue["reportedBy"],
+            "success",
+            "Issue Closed",
+            "Your issue has been closed and points awarded!"
+        )
+    flush_audit(strict=True)
     
     return jsonify({
         "closed": closed_count,
@@ -235,15 +184,16 @@ def bulk_delete():
         try:
             oid = ObjectId(issue_id)
             
-            # Delete issue
-            result = db.issues.delete_one({"_id": oid})
+            # Delete issue, keeping the document for the lifecycle listeners
+            issue = db.issues.find_one_and_delete({"_id": oid})
             
-            if result.deleted_count > 0:
+            if issue is not None:
                 deleted_count += 1
+                issue_deleted(issue)
                 
                 # Clean up related data
                 db.audit_logs.delete_many({"issueId": oid})
-                db.impact_metrics.delete_many({"issueId": oid})
+                remove_impact(issue)  # also subtracts it from the impact rollups
                 db.comments.delete_many({"issueId": oid})
                 db.votes.delete_many({"issueId": oid})
                 
@@ -42,8 +42,8 @@ def add_comment():
     
     # Notify issue reporter if commenter is different
     if user["_id"] != issue["reportedBy"]:
-        from .notifications import create_notification
-        create_notification(
+        from .notifications import notify
+        notify(
             issue["reportedBy"],
             "info",
             "New Comment",
@@ -5,14 +5,17 @@ from flask import Blueprint, jsonify, g
 
 from .. import db
 from ..middleware.auth import auth_required
+from ..utils.impact_engine import IMPACT_FIELDS, read_global_aggregates
+from ..utils.results import cached_result
 
 
 impact_bp = Blueprint("impact", __name__)
 
 
 @impact_bp.get("/global")
+@cached_result("impact")
 def global_impact():
-    agg = db.global_aggregates.find_one({}) or {}
+    agg = read_global_aggregates()
     return jsonify(
         {
             "totalWaterSaved": agg.get("totalWaterSaved", 0),
@@ -29,21 +32,9 @@ def global_impact():
 @auth_required()
 def user_impact():
     user = g.current_user
-    user_id = user["_id"]
-    issues = list(db.issues.find({"reportedBy": user_id}))
-    issue_ids = [i["_id"] for i in issues]
-    metrics = list(db.impact_metrics.find({"issueId": {"$in": issue_ids}}))
-
-    totals = {
-        "waterSaved": 0,
-        "co2Reduced": 0,
-        "wasteRemoved": 0,
-        "fuelSaved": 0,
-        "safetyScore": 0,
-    }
-    for m in metrics:
-        for k in totals:
-            totals[k] += m.get(k, 0)
+    # Kept up to date by persist_impact; see repair_user_impact
+    stored = db.user_impact.find_one({"_id": user["_id"]}) or {}
+    totals = {field: stored.get(field, 0) for field in IMPACT_FIELDS}
 
     return jsonify(
         {
@@ -55,38 +46,14 @@ def user_impact():
 
 @impact_bp.get("/monthly")
 def monthly_impact():
-    # simple monthly aggregation by createdAt of issues
-    pipeline = [
-        {
-            "$lookup": {
-                "from": "impact_metrics",
-                "localField": "_id",
-                "foreignField": "issueId",
-                "as": "metrics",
-            }
-        },
-        {"$unwind": "$metrics"},
-        {
-            "$group": {
-                "_id": {
-                    "year": {"$year": "$createdAt"},
-                    "month": {"$month": "$createdAt"},
-                },
-                "waterSaved": {"$sum": "$metrics.waterSaved"},
-                "co2Reduced": {"$sum": "$metrics.co2Reduced"},
-                "wasteRemoved": {"$sum": "$metrics.wasteRemoved"},
-                "fuelSaved": {"$sum": "$metrics.fuelSaved"},
-            }
-        },
-        {"$sort": {"_id.year": 1, "_id.month": 1}},
-    ]
-    rows = list(db.issues.aggregate(pipeline))
+    # Served from the impact_monthly rollup maintained by persist_impact
+    rows = db.impact_monthly.find().sort("_id", 1)  # "YYYY-MM" keys sort chronologically
     formatted = []
     for r in rows:
         formatted.append(
             {
-                "year": r["_id"]["year"],
-                "month": r["_id"]["month"],
+                "year": r["year"],
+                "month": r["month"],
                 "waterSaved": r.get("waterSaved", 0),
                 "co2Reduced": r.get("co2Reduced", 0),
                 "wasteRemoved": r.get("wasteRemoved", 0),
@@ -97,6 +64,7 @@ def monthly_impact():
 
 
 @impact_bp.get("/leaderboard")
+@cached_result("users")
 def leaderboard():
     """Top users by points for gamification/leaderboard views."""
     cursor = db.users.find({}, {"name": 1, "points": 1, "role": 1}).sort("points", -1).limit(20)
@@ -4,34 +4,51 @@ from bson import ObjectId
 from flask import Blueprint, jsonify, request, g
 
 from .. import db
-from ..middleware.auth import auth_required
-from ..utils.impact_engine import calculate_impact, persist_impact
+from ..middleware.auth import auth_required, invalidate_user
+from ..utils.audit import flush_audit, record_audit
+from ..utils.geo import bbox_filter, geo_point
+from ..utils.jobs import enqueue
+from ..utils.lifecycle import ISSUE_STATES, TransitionError, issue_created, transition_issue
+from ..utils.pagination import paginate_request, page_response, parse_limit
 from ..utils.sdg_mapping import map_category_to_sdg
-
-
-ISSUE_STATES = ["REPORTED", "VERIFIED", "ASSIGNED", "IN_PROGRESS", "RESOLVED", "CLOSED"]
+from ..utils.streaming import MAP_FIELDS, map_point, stream_json_array
+from ..utils.versions import etag_by_version
+
+
+# Fields returned by the paginated listing endpoints
+ISSUE_LIST_FIELDS = {
+    "title": 1,
+    "description": 1,
+    "category": 1,
+    "imageUrl": 1,
+    "location": 1,
+    "sdgTags": 1,
+    "impactType": 1,
+    "status": 1,
+    "reportedBy": 1,
+    "assignedTo": 1,
+    "createdAt": 1,
+    "updatedAt": 1,
+}
+# The reporter is the caller, so it is left out of their own listing
+MY_ISSUE_FIELDS = {**{k: 1 for k in ISSUE_LIST_FIELDS if k != "reportedBy"}, "completionImageUrl": 1}
 
 issues_bp = Blueprint("issues", __name__)
 
 # Import notifications (lazy import to avoid circular dependency if needed, but here it's fine)
-from .notifications import create_notification
+from .notifications import get_admin_ids, notify, notify_many
 
 
-def add_audit_log(issue_id: ObjectId, action: str, user_id: ObjectId):
-    db.audit_logs.insert_one(
-        {
-            "issueId": issue_id,
-            "action": action,
-            "performedBy": user_id,
-            "timestamp": datetime.utcnow(),
-        }
-    )
+def add_audit_log(issue_id: ObjectId, action: str, user_id: ObjectId, strict: bool = False):
+    # Buffered and batch-inserted; admin actions pass strict=True to hit disk now
+    record_audit(issue_id, action, user_id, strict=strict)
 
 
 def award_points(user_id: ObjectId, delta: int):
     if delta == 0:
         return
     db.users.update_one({"_id": user_id}, {"$inc": {"points": delta}})
+    invalidate_user(user_id)
 
 
 @issues_bp.post("/create")
@@ -52,6 +69,7 @@ def create_issue():
         "category": data["category"],
         "imageUrl": data.get("imageUrl"),
         "location": data["location"],
+        "geo": geo_point(data["location"]),
         "sdgTags": mapping["sdgTags"],
         "impactType": mapping["impactType"],
         "status": "REPORTED",
@@ -60,8 +78,12 @@ def create_issue():
         "createdAt": now,
         "updatedAt": now,
     }
+    if issue_doc["geo"] is None:
+        # Not indexable; nearby search skips issues without a point
+        del issue_doc["geo"]
     res = db.issues.insert_one(issue_doc)
     issue_id = res.inserted_id
+    issue_created(issue_doc)
 
     # audit + gamification
     add_audit_log(issue_id, "REPORTED", user["_id"])
@@ -70,15 +92,18 @@ def create_issue():
         points += 5
     award_points(user["_id"], points)
 
+    # Subscribers whose area covers the issue are matched on the job queue
+    if "geo" in issue_doc:
+        lng, lat = issue_doc["geo"]["coordinates"]
+        enqueue("area_match", issue_id, lat, lng, user["_id"], data["title"], data["category"])
+
     # Notify all admins
-    admins = db.users.find({"role": "admin"})
-    for admin in admins:
-        create_notification(
-            admin["_id"], 
-            "info", 
-            "New Issue Reported", 
-            f"New issue '{data['title']}' reported in {data['category']}"
-        )
+    notify_many(
+        get_admin_ids(),
+        "info",
+        "New Issue Reported",
+        f"New issue '{data['title']}' reported in {data['category']}"
+    )
 
     return jsonify({"id": str(issue_id)}), 201
 
@@ -86,46 +111,51 @@ def create_issue():
 @issues_bp.get("/all")
 @auth_required(roles=["admin"])
 def get_all_issues():
+    docs, next_cursor = paginate_request(db.issues, {}, "createdAt", ISSUE_LIST_FIELDS)
     items = []
-    for doc in db.issues.find().sort("createdAt", -1):
+    for doc in docs:
         doc["id"] = str(doc["_id"])
         doc["reportedBy"] = str(doc["reportedBy"])
         doc["assignedTo"] = str(doc["assignedTo"]) if doc.get("assignedTo") else None
         doc.pop("_id", None)
         items.append(doc)
-    return jsonify(items)
+    return page_response(items, next_cursor)
 
 
 @issues_bp.get("/public")
+@etag_by_version("issues")
 def get_public_issues():
-    """Public map-friendly subset of issues without PII."""
-    items = []
-    for doc in db.issues.find({}, {"title": 1, "category": 1, "location": 1, "status": 1, "createdAt": 1, "imageUrl": 1, "description": 1}):
-        items.append(
-            {
-                "id": str(doc["_id"]),
-                "title": doc.get("title"),
-                "category": doc.get("category"),
-                "location": doc.get("location"),
-                "status": doc.get("status"),
-                "imageUrl": doc.get("imageUrl"),
-                "description": doc.get("description"),
-                "createdAt": doc.get("createdAt").isoformat() if doc.get("createdAt") else None,
-            }
-        )
-    return jsonify(items)
+    """Public map-friendly subset of issues without PII, newest first.
+
+    Optional filters: ``bbox`` (minLng,minLat,maxLng,maxLat), ``status``, ``category``;
+    ``limit`` keeps only the newest rows (at most MAX_LIMIT).
+    """
+    try:
+        query = bbox_filter(request.args.get("bbox"))
+    except ValueError:
+        return jsonify({"error": "Invalid bbox"}), 400
+    if request.args.get("status"):
+        query["status"] = request.args["status"]
+    if request.args.get("category"):
+        query["category"] = request.args["category"]
+    cursor = db.issues.find(query, MAP_FIELDS).sort("createdAt", -1)
+    if request.args.get("limit"):
+        cursor = cursor.limit(parse_limit(request.args["limit"]))
+    return stream_json_array(cursor, map_point)
 
 
 @issues_bp.get("/my")
 @auth_required()
 def get_my_issues():
     user = g.current_user
+    docs, next_cursor = paginate_request(db.issues, {"reportedBy": user["_id"]}, "createdAt", MY_ISSUE_FIELDS)
     items = []
-    for doc in db.issues.find({"reportedBy": user["_id"]}).sort("createdAt", -1):
+    for doc in docs:
         doc["id"] = str(doc["_id"])
+        doc["assignedTo"] = str(doc["assignedTo"]) if doc.get("assignedTo") else None
         doc.pop("_id", None)
         items.append(doc)
-    return jsonify(items)
+    return page_response(items, next_cursor)
 
 
 @issues_bp.get("/<issue_id>")
@@ -140,6 +170,8 @@ def get_issue(issue_id):
     if not doc:
         return jsonify({"error": "Not found"}), 404
 
+    # Make this process's buffered entries visible before reading them back
+    flush_audit()
     timeline = []
     for log in db.audit_logs.find({"issueId": oid}).sort("timestamp", 1):
         timeline.append(
@@ -163,21 +195,15 @@ def verify_issue():
     if not issue_id:
         return jsonify({"error": "issueId required"}), 400
 
-    oid = ObjectId(issue_id)
-    issue = db.issues.find_one({"_id": oid})
-    if not issue:
-        return jsonify({"error": "Issue not found"}), 404
-        
-    res = db.issues.update_one(
-        {"_id": oid, "status": "REPORTED"}, {"$set": {"status": "VERIFIED", "updatedAt": datetime.utcnow()}}
-    )
-    if res.matched_count == 0:
-        return jsonify({"error": "Issue not in REPORTED state"}), 400
+    try:
+        issue = transition_issue(issue_id, "VERIFIED")
+    except TransitionError as e:
+        return jsonify({"error": str(e)}), e.status_code
 
-    add_audit_log(oid, "VERIFIED", g.current_user["_id"])
+    add_audit_log(issue["_id"], "VERIFIED", g.current_user["_id"], strict=True)
     
     # Notify Citizen
-    create_notification(issue["reportedBy"], "info", "Issue Verified", f"Your issue '{issue['title']}' has been verified by admin.")
+    notify(issue["reportedBy"], "info", "Issue Verified", f"Your issue '{issue['title']}' has been verified by admin.")
     
     return jsonify({"status": "VERIFIED"})
 
@@ -191,37 +217,25 @@ def assign_issue():
     if not issue_id or not worker_id:
         return jsonify({"error": "Missing fields"}), 400
 
-    oid = ObjectId(issue_id)
     wid = ObjectId(worker_id)
 
     worker = db.users.find_one({"_id": wid, "role": "worker"})
     if not worker:
         return jsonify({"error": "Worker not found"}), 400
 
-    oid = ObjectId(issue_id)
-    issue = db.issues.find_one({"_id": oid})
-    if not issue:
-        return jsonify({"error": "Issue not found"}), 404
-
-    res = db.issues.update_one(
-        {"_id": oid, "status": {"$in": ["VERIFIED", "REPORTED"]}},
-        {
-            "$set": {
-                "assignedTo": wid,
-                "status": "ASSIGNED",
-                "updatedAt": datetime.utcnow(),
-            }
-        },
-    )
-    if res.matched_count == 0:
-        return jsonify({"error": "Issue not assignable"}), 400
+    try:
+        issue = transition_issue(
+            issue_id, "ASSIGNED", set_fields={"assignedTo": wid}, from_states=["VERIFIED", "REPORTED"]
+        )
+    except TransitionError as e:
+        return jsonify({"error": str(e)}), e.status_code
 
-    add_audit_log(oid, "ASSIGNED", g.current_user["_id"])
+    add_audit_log(issue["_id"], "ASSIGNED", g.current_user["_id"], strict=True)
     
     # Notify Worker
-    create_notification(wid, "info", "New Task Assigned", f"You have been assigned to issue '{issue['title']}'")
+    notify(wid, "info", "New Task Assigned", f"You have been assigned to issue '{issue['title']}'")
     # Notify Citizen
-    create_notification(issue["reportedBy"], "info", "Issue Assigned", f"A worker has been assigned to your issue '{issue['title']}'")
+    notify(issue["reportedBy"], "info", "Issue Assigned", f"A worker has been assigned to your issue '{issue['title']}'")
     
     return jsonify({"status": "ASSIGNED"})
 
@@ -235,11 +249,6 @@ def update_status():
     if not issue_id or new_status not in ISSUE_STATES:
         return jsonify({"error": "Invalid request"}), 400
 
-    oid = ObjectId(issue_id)
-    issue = db.issues.find_one({"_id": oid})
-    if not issue:
-        return jsonify({"error": "Issue not found"}), 404
-
     user = g.current_user
     role = user["role"]
 
@@ -249,19 +258,25 @@ def update_status():
     if new_status == "CLOSED" and role != "admin":
         return jsonify({"error": "Only admin can close"}), 403
 
-    db.issues.update_one({"_id": oid}, {"$set": {"status": new_status, "updatedAt": datetime.utcnow()}})
-    add_audit_log(oid, new_status, user["_id"])
+    # Workers may only move their own tasks
+    match = {"assignedTo": user["_id"]} if role == "worker" else None
+    try:
+        issue = transition_issue(issue_id, new_status, match=match)
+    except TransitionError as e:
+        return jsonify({"error": str(e)}), e.status_code
+
+    oid = issue["_id"]
+    add_audit_log(oid, new_status, user["_id"], strict=role == "admin")
 
     # Notify Citizen
-    create_notification(issue["reportedBy"], "info", f"Status: {new_status}", f"Your issue is now {new_status}")
+    notify(issue["reportedBy"], "info", f"Status: {new_status}", f"Your issue is now {new_status}")
 
     # Impact + points only when CLOSED
     if new_status == "CLOSED":
-        impact = calculate_impact(issue, datetime.utcnow())
-        persist_impact(oid, impact, issue.get("reportedBy"))
+        enqueue("impact", issue, issue["closedAt"])
         # Award citizen points
         award_points(issue["reportedBy"], 20)
-        create_notification(issue["reportedBy"], "success", "Points Earned!", "You earned 20 points for resolving an issue.")
+        notify(issue["reportedBy"], "success", "Points Earned!", "You earned 20 points for resolving an issue.")
 
     return jsonify({"status": new_status})
 
@@ -274,21 +289,18 @@ def close_issue():
     if not issue_id:
         return jsonify({"error": "issueId required"}), 400
 
-    oid = ObjectId(issue_id)
-    issue = db.issues.find_one({"_id": oid})
-    if not issue:
-        return jsonify({"error": "Not found"}), 404
+    try:
+        issue = transition_issue(issue_id, "CLOSED")
+    except TransitionError as e:
+        return jsonify({"error": str(e)}), e.status_code
 
-    db.issues.update_one({"_id": oid}, {"$set": {"status": "CLOSED", "updatedAt": datetime.utcnow()}})
-    add_audit_log(oid, "CLOSED", g.current_user["_id"])
+    oid = issue["_id"]
+    add_audit_log(oid, "CLOSED", g.current_user["_id"], strict=True)
 
-    impact = calculate_impact(issue, datetime.utcnow())
-    persist_impact(oid, impact, issue.get("reportedBy"))
+    enqueue("impact", issue, issue["closedAt"])
     award_points(issue["reportedBy"], 20)
     
     # Notify Citizen
-    create_notification(issue["reportedBy"], "success", "Issue Closed", "Your issue has been closed and points awarded!")
+    notify(issue["reportedBy"], "success", "Issue Closed", "Your issue has been closed and points awarded!")
 
     return jsonify({"status": "CLOSED"})
-
-
@@ -4,12 +4,58 @@ from flask import Blueprint, jsonify, request, g
 
 from .. import db
 from ..middleware.auth import auth_required
+from ..utils.geo import geo_point
+from ..utils.hotspots import stored_hotspots
+from ..utils.pagination import decode_cursor, encode_cursor, page_response, parse_limit
+from ..utils.spatial_index import OPEN_STATES, get_spatial_index
+from ..utils.subscriptions import subscription_area
 
 nearby_bp = Blueprint("nearby", __name__)
 
+MAX_SUBSCRIPTION_RADIUS_KM = 50
+
+NEARBY_FIELDS = {
+    "title": 1,
+    "category": 1,
+    "status": 1,
+    "location": 1,
+    "distance": 1,
+    "imageUrl": 1,
+    "createdAt": 1,
+}
+
+def _nearby_from_mongo(center: dict, radius_m: float, query: dict, limit: int, after=None) -> list:
+    """(distance_m, issue) rows from $geoNear on the 2dsphere index on `geo`."""
+    geo_near = {
+        "near": center,
+        "distanceField": "distance",
+        "maxDistance": radius_m,
+        "spherical": True,
+        "query": query,
+    }
+    pipeline = [{"$geoNear": geo_near}]
+    if after:
+        last_distance, last_id = after
+        geo_near["minDistance"] = last_distance
+        pipeline.append({
+            "$match": {
+                "$or": [
+                    {"distance": {"$gt": last_distance}},
+                    {"distance": last_distance, "_id": {"$gt": last_id}}
+                ]
+            }
+        })
+    pipeline += [
+        {"$sort": {"distance": 1, "_id": 1}},
+        {"$limit": limit},
+        {"$project": NEARBY_FIELDS}
+    ]
+    return [(doc["distance"], doc) for doc in db.issues.aggregate(pipeline)]
+
+
 @nearby_bp.get("/issues")
 def get_nearby_issues():
-    """Get issues near a location (public endpoint)"""
+    """Get issues near a location, nearest first (public endpoint)"""
     
     try:
         lat = float(request.args.get("lat"))
@@ -17,84 +63,73 @@ def get_nearby_issues():
         radius_km = float(request.args.get("radius", 5))  # Default 5km
     except (TypeError, ValueError):
         return jsonify({"error": "Invalid coordinates"}), 400
+    center = geo_point({"lat": lat, "lng": lng})
+    if center is None:
+        return jsonify({"error": "Invalid coordinates"}), 400
     
-    # Convert km to degrees (approximate)
-    # 1 degree ≈ 111 km
-    radius_deg = radius_km / 111.0
-    
-    # Find issues within bounding box
-    query = {
-        "location.lat": {"$gte": lat - radius_deg, "$lte": lat + radius_deg},
-        "location.lng": {"$gte": lng - radius_deg, "$lte": lng + radius_deg}
-    }
-    
-    # Optional filters
+    # Optional filters; status=open means every state before CLOSED
     status = request.args.get("status")
     category = request.args.get("category")
+    statuses = OPEN_STATES if status == "open" else [status] if status else None
     
-    if status:
-        query["status"] = status
+    query = {}
+    if statuses:
+        query["status"] = {"$in": statuses}
     if category:
         query["category"] = category
     
+    limit = parse_limit(request.args.get("limit"), default=50)
+    cursor = request.args.get("cursor")
+    after = decode_cursor(cursor) if cursor else None
+    
+    # Open-issue queries are answered from the in-memory index when enabled;
+    # pages continue after the (distance, _id) of the previous page's last row
+    index = get_spatial_index()
+    if index is not None and index.covers(statuses):
+        rows = index.nearby(lat, lng, radius_km * 1000, statuses, category, after)[:limit + 1]
+    else:
+        rows = _nearby_from_mongo(center, radius_km * 1000, query, limit + 1, after)
+    
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1][0], rows[-1][1]["_id"])
+    
     issues = []
-    for issue in db.issues.find(query).limit(50):
-        # Calculate approximate distance
-        lat_diff = abs(issue["location"]["lat"] - lat)
-        lng_diff = abs(issue["location"]["lng"] - lng)
-        distance = ((lat_diff ** 2 + lng_diff ** 2) ** 0.5) * 111  # Approximate km
-        
+    for distance, issue in rows:
         issues.append({
             "id": str(issue["_id"]),
             "title": issue["title"],
             "category": issue["category"],
             "status": issue["status"],
             "location": issue["location"],
-            "distance": round(distance, 2),
+            "distance": round(distance / 1000, 2),
             "imageUrl": issue.get("imageUrl"),
             "createdAt": issue["createdAt"].isoformat()
         })
     
-    # Sort by distance
-    issues.sort(key=lambda x: x["distance"])
-    
-    return jsonify({
+    return page_response({
         "center": {"lat": lat, "lng": lng},
         "radius": radius_km,
         "count": len(issues),
-        "issues": issues
-    })
+        "issues": issues,
+        "nextCursor": next_cursor
+    }, next_cursor)
 
 @nearby_bp.get("/hotspots")
 def get_hotspots():
     """Identify areas with multiple issues"""
     
-    # Group issues by approximate location (0.01 degree grid ≈ 1km)
-    pipeline = [
-        {
-            "$group": {
-                "_id": {
-                    "lat": {"$round": [{"$multiply": ["$location.lat", 100]}, 0]},
-                    "lng": {"$round": [{"$multiply": ["$location.lng", 100]}, 0]}
-                },
-                "count": {"$sum": 1},
-                "categories": {"$addToSet": "$category"},
-                "statuses": {"$addToSet": "$status"}
-            }
-        },
-        {"$match": {"count": {"$gte": 3}}},  # At least 3 issues
-        {"$sort": {"count": -1}},
-        {"$limit": 20}
-    ]
-    
+    # Precomputed clusters ("nearby" profile), refreshed in the background
     hotspots = []
-    for spot in db.issues.aggregate(pipeline):
+    for spot in stored_hotspots("nearby"):
         hotspots.append({
             "location": {
-                "lat": spot["_id"]["lat"] / 100,
-                "lng": spot["_id"]["lng"] / 100
+                "lat": round(spot["center"]["lat"], 5),
+                "lng": round(spot["center"]["lng"], 5)
             },
-            "issueCount": spot["count"],
+            "radius": spot["radiusM"],
+            "issueCount": spot["issueCount"],
             "categories": spot["categories"],
             "statuses": spot["statuses"]
         })
@@ -114,16 +149,21 @@ def subscribe_to_area():
         radius = float(data.get("radius", 5))
     except (TypeError, ValueError):
         return jsonify({"error": "Invalid coordinates"}), 400
+    if geo_point({"lat": lat, "lng": lng}) is None:
+        return jsonify({"error": "Invalid coordinates"}), 400
+    if not 0 < radius <= MAX_SUBSCRIPTION_RADIUS_KM:
+        return jsonify({"error": f"Radius must be between 0 and {MAX_SUBSCRIPTION_RADIUS_KM} km"}), 400
     
     user = g.current_user
     
-    # Store subscription
+    # Store subscription; `area` is the indexed circle new issues are matched against
     db.area_subscriptions.update_one(
         {"userId": user["_id"]},
         {
             "$set": {
                 "location": {"lat": lat, "lng": lng},
                 "radius": radius,
+                **subscription_area(lat, lng, radius),
                 "active": True,
                 "updatedAt": datetime.utcnow()
             },
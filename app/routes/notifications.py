@@ -1,17 +1,28 @@
 from datetime import datetime
 from bson import ObjectId
 from flask import Blueprint, jsonify, request, g
+from pymongo.errors import BulkWriteError, DuplicateKeyError
 from .. import db
 from ..middleware.auth import auth_required
+from ..utils.cache import TTLCache
+from ..utils.jobs import current_job_id, enqueue, register_job
 
 notifications_bp = Blueprint("notifications", __name__)
 
+# Ids of every admin, the audience of "new issue" notifications
+_admin_ids_cache = TTLCache(maxsize=1, ttl=300)
+
+def _dedupe_key(user_id: ObjectId):
+    """Unique per job and recipient, so a job that runs twice notifies once."""
+    job_id = current_job_id()
+    return f"{job_id}:{user_id}" if job_id else None
+
 def create_notification(user_id: ObjectId, type: str, title: str, message: str, link: str = None):
     """
     Creates a new notification for a user.
     Types: 'info', 'success', 'warning', 'error'
     """
-    db.notifications.insert_one({
+    doc = {
         "userId": user_id,
         "type": type,
         "title": title,
@@ -19,7 +30,68 @@ def create_notification(user_id: ObjectId, type: str, title: str, message: str,
         "link": link,
         "read": False,
         "createdAt": datetime.utcnow()
-    })
+    }
+    key = _dedupe_key(user_id)
+    if key:
+        doc["dedupeKey"] = key
+    try:
+        db.notifications.insert_one(doc)
+    except DuplicateKeyError:
+        pass  # already sent by an earlier run of this job
+
+def create_notifications(user_ids, type: str, title: str, message: str, link: str = None):
+    """Creates the same notification for many users with one insert_many."""
+    now = datetime.utcnow()
+    docs = []
+    for user_id in dict.fromkeys(user_ids):
+        doc = {
+            "userId": user_id,
+            "type": type,
+            "title": title,
+            "message": message,
+            "link": link,
+            "read": False,
+            "createdAt": now
+        }
+        key = _dedupe_key(user_id)
+        if key:
+            doc["dedupeKey"] = key
+        docs.append(doc)
+    if docs:
+        try:
+            db.notifications.insert_many(docs, ordered=False)
+        except BulkWriteError as exc:
+            # Recipients an earlier run of this job already notified
+            if any(error["code"] != 11000 for error in exc.details["writeErrors"]):
+                raise
+
+register_job("notification", create_notification)
+register_job("notifications", create_notifications)
+
+
+def notify(user_id: ObjectId, type: str, title: str, message: str, link: str = None):
+    """Queue a notification instead of writing it on the request thread."""
+    enqueue("notification", user_id, type, title, message, link)
+
+
+def notify_many(user_ids, type: str, title: str, message: str, link: str = None):
+    """Queue one batched notification for several users."""
+    user_ids = list(user_ids)
+    if user_ids:
+        enqueue("notifications", user_ids, type, title, message, link)
+
+
+def get_admin_ids() -> list:
+    admin_ids = _admin_ids_cache.get("admins")
+    if admin_ids is None:
+        admin_ids = [u["_id"] for u in db.users.find({"role": "admin"}, {"_id": 1})]
+        _admin_ids_cache.set("admins", admin_ids)
+    return admin_ids
+
+
+def invalidate_admin_ids():
+    """Call after a user's role may have changed or an admin was removed."""
+    _admin_ids_cache.clear()
 
 @notifications_bp.get("/")
 @auth_required()
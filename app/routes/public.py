@@ -5,66 +5,54 @@ import secrets
 
 from .. import db
 from ..middleware.auth import auth_required
-from ..utils.email import send_email
+from ..utils.impact_engine import read_global_aggregates
+from ..utils.jobs import enqueue
+from ..utils import map_grid
+from ..utils.results import cached_result
+from ..utils.geo import bbox_filter, bbox_polygon, parse_bbox
+from ..utils.stats import issue_stats, user_role_counts
+from ..utils.streaming import MAP_FIELDS, map_point, stream_json_array
+from ..utils.versions import etag_by_version
 
 public_bp = Blueprint("public", __name__)
 
+# Map zoom from which /map-clusters returns individual issues, and their cap
+POINTS_ZOOM = 16
+MAX_MAP_POINTS = 1000
+
 @public_bp.get("/dashboard")
+@cached_result("issues", "users", "impact")
 def public_dashboard():
     """Public dashboard statistics - no auth required"""
     
-    # Total counts
-    total_issues = db.issues.count_documents({})
-    resolved_issues = db.issues.count_documents({"status": {"$in": ["RESOLVED", "CLOSED"]}})
-    active_citizens = db.users.count_documents({"role": "citizen"})
+    stats = issue_stats(["categories", "topReporters", "recent"])
+    total_issues = stats["total"]
+    resolved_issues = stats["resolved"]
+    active_citizens = user_role_counts()["citizen"]
     
     # Impact metrics
-    impact = db.global_aggregates.find_one() or {}
-    
-    # Recent issues (last 10)
-    recent = []
-    for issue in db.issues.find().sort("createdAt", -1).limit(10):
-        recent.append({
-            "id": str(issue["_id"]),
-            "title": issue["title"],
-            "category": issue["category"],
-            "status": issue["status"],
-            "location": issue["location"],
-            "createdAt": issue["createdAt"].isoformat()
-        })
-    
-    # Category breakdown
-    category_pipeline = [
-        {"$group": {"_id": "$category", "count": {"$sum": 1}}},
-        {"$sort": {"count": -1}}
-    ]
-    categories = [{"category": c["_id"], "count": c["count"]} 
-                  for c in db.issues.aggregate(category_pipeline)]
-    
-    # Status breakdown
-    status_pipeline = [
-        {"$group": {"_id": "$status", "count": {"$sum": 1}}},
-        {"$sort": {"count": -1}}
-    ]
-    statuses = [{"status": s["_id"], "count": s["count"]} 
-                for s in db.issues.aggregate(status_pipeline)]
-    
-    # Top contributors
-    top_pipeline = [
-        {"$group": {"_id": "$reportedBy", "count": {"$sum": 1}}},
-        {"$sort": {"count": -1}},
-        {"$limit": 5}
-    ]
-    top_data = list(db.issues.aggregate(top_pipeline))
-    top_contributors = []
-    for item in top_data:
-        user = db.users.find_one({"_id": item["_id"]})
-        if user:
-            top_contributors.append({
-                "name": user["name"],
-                "points": user.get("points", 0),
-                "issuesReported": item["count"]
-            })
+    impact = read_global_aggregates()
+    
+    recent = [{
+        "id": str(issue["_id"]),
+        "title": issue["title"],
+        "category": issue["category"],
+        "status": issue["status"],
+        "location": issue["location"],
+        "createdAt": issue["createdAt"].isoformat()
+    } for issue in stats["recent"]]
+    
+    statuses = sorted(
+        ({"status": status, "count": count} for status, count in stats["statuses"].items() if count),
+        key=lambda s: s["count"],
+        reverse=True
+    )
+    
+    top_contributors = [{
+        "name": r["name"],
+        "points": r.get("points") or 0,
+        "issuesReported": r["count"]
+    } for r in stats["topReporters"]]
     
     return jsonify({
         "overview": {
@@ -80,37 +68,61 @@ def public_dashboard():
             "issuesResolved": impact.get("totalIssuesResolved", 0)
         },
         "recentIssues": recent,
-        "categoryBreakdown": categories,
+        "categoryBreakdown": stats["categories"],
         "statusBreakdown": statuses,
         "topContributors": top_contributors
     })
 
 @public_bp.get("/map-data")
+@etag_by_version("issues")
 def public_map_data():
-    """Get all issues for public map display"""
+    """Get issues for public map display, optionally within ?bbox=minLng,minLat,maxLng,maxLat"""
     
     status_filter = request.args.get("status")
     category_filter = request.args.get("category")
     
-    query = {}
+    try:
+        query = bbox_filter(request.args.get("bbox"))
+    except ValueError:
+        return jsonify({"error": "Invalid bbox"}), 400
     if status_filter:
         query["status"] = status_filter
     if category_filter:
         query["category"] = category_filter
     
-    issues = []
-    for issue in db.issues.find(query):
-        issues.append({
-            "id": str(issue["_id"]),
-            "title": issue["title"],
-            "category": issue["category"],
-            "status": issue["status"],
-            "location": issue["location"],
-            "imageUrl": issue.get("imageUrl"),
-            "createdAt": issue["createdAt"].isoformat()
+    return stream_json_array(db.issues.find(query, MAP_FIELDS), map_point)
+
+@public_bp.get("/map-clusters")
+@etag_by_version("issues")
+def public_map_clusters():
+    """Clustered map markers for a viewport: ?bbox=minLng,minLat,maxLng,maxLat&zoom=Z
+    
+    Below POINTS_ZOOM the response has one centroid per grid cell with its
+    issue count; from POINTS_ZOOM on it lists the individual issues.
+    """
+    try:
+        bbox = parse_bbox(request.args.get("bbox"))
+        zoom = int(request.args.get("zoom", 12))
+    except (TypeError, ValueError):
+        return jsonify({"error": "bbox and zoom are required"}), 400
+    
+    status_filter = request.args.get("status")
+    category_filter = request.args.get("category")
+    
+    if zoom < POINTS_ZOOM:
+        return jsonify({
+            "zoom": zoom,
+            "clusters": map_grid.clusters(bbox, zoom, status_filter, category_filter),
+            "points": []
         })
     
-    return jsonify(issues)
+    query = {"geo": {"$geoWithin": {"$geometry": bbox_polygon(bbox)}}}
+    if status_filter:
+        query["status"] = status_filter
+    if category_filter:
+        query["category"] = category_filter
+    points = [map_point(doc) for doc in db.issues.find(query, MAP_FIELDS).limit(MAX_MAP_POINTS)]
+    return jsonify({"zoom": zoom, "clusters": [], "points": points})
 
 @public_bp.post("/contact")
 def contact_form():
@@ -133,10 +145,11 @@ def contact_form():
     
     # Send notification email to admin
     try:
-        send_email(
-            to="admin@urbanpulse.local",
-            subject=f"New Contact Form: {data['subject']}",
-            html=f"""
+        enqueue(
+            "email",
+            "admin@urbanpulse.local",
+            f"New Contact Form: {data['subject']}",
+            f"""
             <h2>New Contact Form Submission</h2>
             <p><strong>From:</strong> {data['name']} ({data['email']})</p>
             <p><strong>Subject:</strong> {data['subject']}</p>
@@ -150,6 +163,7 @@ def contact_form():
     return jsonify({"message": "Thank you for contacting us! We'll respond soon."})
 
 @public_bp.get("/statistics")
+@cached_result("issues")
 def public_statistics():
     """Detailed public statistics"""
     
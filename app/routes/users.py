@@ -3,7 +3,8 @@ from bson import ObjectId
 from flask import Blueprint, jsonify, request, g
 
 from .. import db
-from ..middleware.auth import auth_required
+from ..middleware.auth import auth_required, invalidate_user
+from .notifications import invalidate_admin_ids
 
 users_bp = Blueprint("users", __name__)
 
@@ -97,6 +98,9 @@ def update_user(user_id):
     if result.matched_count == 0:
         return jsonify({"error": "User not found"}), 404
     
+    invalidate_user(oid)
+    if "role" in update_fields:
+        invalidate_admin_ids()
     return jsonify({"message": "User updated successfully"})
 
 @users_bp.delete("/<user_id>")
@@ -119,6 +123,9 @@ def delete_user(user_id):
     
     # Delete user
     db.users.delete_one({"_id": oid})
+    invalidate_user(oid)
+    if user.get("role") == "admin":
+        invalidate_admin_ids()
     
     # Clean up related data
     db.notifications.delete_many({"userId": oid})
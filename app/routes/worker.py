@@ -5,11 +5,27 @@ from flask import Blueprint, jsonify, request, g
 
 from .. import db
 from ..middleware.auth import auth_required
+from ..utils.lifecycle import TransitionError, transition_issue
+from ..utils.pagination import paginate_request, page_response
 from .issues import add_audit_log
 
 
 worker_bp = Blueprint("worker", __name__)
 
+TASK_FIELDS = {
+    "title": 1,
+    "description": 1,
+    "category": 1,
+    "imageUrl": 1,
+    "completionImageUrl": 1,
+    "location": 1,
+    "status": 1,
+    "reportedBy": 1,
+    "assignedTo": 1,
+    "createdAt": 1,
+    "updatedAt": 1,
+}
+
 
 @worker_bp.get("/tasks")
 @auth_required(roles=["worker"])
@@ -26,8 +42,9 @@ def get_tasks():
         else:
              query["status"] = status_filter
 
+    docs, next_cursor = paginate_request(db.issues, query, "updatedAt", TASK_FIELDS)
     items = []
-    for doc in db.issues.find(query).sort("updatedAt", -1):
+    for doc in docs:
         try:
             doc["id"] = str(doc["_id"])
             doc.pop("_id", None)
@@ -42,7 +59,7 @@ def get_tasks():
             items.append(doc)
         except Exception:
             continue
-    return jsonify(items)
+    return page_response(items, next_cursor)
 
 
 @worker_bp.get("/available-tasks")
@@ -51,8 +68,9 @@ def get_available_tasks():
     """Get verified issues that are not assigned to anyone."""
     query = {"status": "VERIFIED", "assignedTo": None}
     
+    docs, next_cursor = paginate_request(db.issues, query, "createdAt", TASK_FIELDS)
     items = []
-    for doc in db.issues.find(query).sort("createdAt", -1):
+    for doc in docs:
         try:
             doc["id"] = str(doc["_id"])
             doc.pop("_id", None)
@@ -65,7 +83,7 @@ def get_available_tasks():
             items.append(doc)
         except Exception:
             continue
-    return jsonify(items)
+    return page_response(items, next_cursor)
 
 
 @worker_bp.get("/stats")
@@ -115,20 +133,16 @@ def update_progress():
     
     if not issue_id:
         return jsonify({"error": "issueId required"}), 400
+    if status not in ["IN_PROGRESS", "RESOLVED"]:
+        return jsonify({"error": "Invalid status"}), 400
 
-    oid = ObjectId(issue_id)
     user = g.current_user
-    
-    update_data = {"status": status, "updatedAt": datetime.utcnow()}
-    
-    res = db.issues.update_one(
-        {"_id": oid, "assignedTo": user["_id"]},
-        {"$set": update_data},
-    )
-    
-    if res.matched_count == 0:
-        return jsonify({"error": "Issue not found or not assigned"}), 400
+    try:
+        issue = transition_issue(issue_id, status, match={"assignedTo": user["_id"]})
+    except TransitionError as e:
+        return jsonify({"error": str(e)}), e.status_code
 
+    oid = issue["_id"]
     add_audit_log(oid, status, user["_id"])
     
     # Add note if provided
@@ -154,19 +168,17 @@ def resolve_issue():
     if not issue_id:
         return jsonify({"error": "issueId required"}), 400
 
-    oid = ObjectId(issue_id)
     user = g.current_user
-    update = {
-        "status": "RESOLVED",
-        "updatedAt": datetime.utcnow(),
-    }
+    update = {}
     if completion_image:
         update["completionImageUrl"] = completion_image
 
-    res = db.issues.update_one({"_id": oid, "assignedTo": user["_id"]}, {"$set": update})
-    if res.matched_count == 0:
-        return jsonify({"error": "Issue not found or not assigned"}), 400
+    try:
+        issue = transition_issue(issue_id, "RESOLVED", set_fields=update, match={"assignedTo": user["_id"]})
+    except TransitionError as e:
+        return jsonify({"error": str(e)}), e.status_code
 
+    oid = issue["_id"]
     add_audit_log(oid, "RESOLVED", user["_id"])
     
     if note:
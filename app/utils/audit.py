@@ -0,0 +1,129 @@
+import atexit
+import logging
+import threading
+from datetime import datetime
+
+from bson import ObjectId
+from pymongo.errors import BulkWriteError, PyMongoError
+
+from .. import db
+
+
+logger = logging.getLogger(__name__)
+
+DUPLICATE_KEY = 11000
+
+
+class AuditWriteError(Exception):
+    """A strict audit write could not reach the database (its entries stay buffered)."""
+
+
+class AuditWriter:
+    """Buffers audit log entries and writes them with one insert_many.
+
+    The buffer is flushed when it reaches `batch_size` entries, every
+    `flush_interval` seconds from a background thread, on process exit and
+    immediately for strict writes. Entries are stamped when recorded, so
+    buffering never changes the order of an issue's timeline. If a flush
+    fails the entries that were not written go back into the buffer
+    (capped at `max_buffer`) and are retried on the next flush; a strict
+    flush also raises AuditWriteError so the request can report it.
+    insert_many gives each entry its ``_id`` up front, so an entry that was
+    written after all comes back as a duplicate key and is dropped.
+    """
+
+    def __init__(self, batch_size=200, flush_interval=1.0, strict=False, max_buffer=50000):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.strict = strict
+        self.max_buffer = max_buffer
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None or self.flush_interval <= 0:
+            return
+        self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def write(self, issue_id: ObjectId, action: str, user_id: ObjectId, strict: bool = False):
+        entry = {
+            "issueId": issue_id,
+            "action": action,
+            "performedBy": user_id,
+            "timestamp": datetime.utcnow(),
+        }
+        with self._lock:
+            self._buffer.append(entry)
+            full = len(self._buffer) >= self.batch_size
+        if strict or self.strict:
+            self.flush(strict=True)
+        elif full or self._thread is None:
+            self.flush()
+
+    def flush(self, strict: bool = False):
+        """Write the buffer; with `strict`, raise AuditWriteError if entries are left unwritten."""
+        with self._flush_lock:
+            with self._lock:
+                entries, self._buffer = self._buffer, []
+            if not entries:
+                return
+            try:
+                db.audit_logs.insert_many(entries, ordered=False)
+                return
+            except BulkWriteError as exc:
+                failed = [
+                    entries[error["index"]]
+                    for error in exc.details["writeErrors"]
+                    if error["code"] != DUPLICATE_KEY
+                ]
+                error = exc
+            except PyMongoError as exc:
+                failed, error = entries, exc
+            if not failed:
+                return
+            logger.error("Audit flush of %d entries failed; will retry: %s", len(failed), error)
+            with self._lock:
+                self._buffer = (failed + self._buffer)[-self.max_buffer:]
+        if strict:
+            raise AuditWriteError(f"{len(failed)} audit entries could not be written") from error
+
+    def close(self):
+        """Flush-on-shutdown hook."""
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(self.flush_interval + 1)
+            self._thread = None
+        self.flush()
+
+    def _run(self):
+        while not self._stopping.wait(self.flush_interval):
+            self.flush()
+
+
+# Writes straight through until init_audit() starts the background flusher
+audit_writer = AuditWriter()
+
+
+def init_audit(app):
+    global audit_writer
+    audit_writer = AuditWriter(
+        batch_size=app.config["AUDIT_BATCH_SIZE"],
+        flush_interval=app.config["AUDIT_FLUSH_INTERVAL"],
+        strict=app.config["AUDIT_STRICT"],
+    )
+    audit_writer.start()
+
+
+def record_audit(issue_id: ObjectId, action: str, user_id: ObjectId, strict: bool = False):
+    """Buffer an audit entry; `strict` forces it (and the buffer) to disk now."""
+    audit_writer.write(issue_id, action, user_id, strict=strict)
+
+
+def flush_audit(strict: bool = False):
+    """Write buffered entries now; `strict` raises AuditWriteError if some could not be."""
+    audit_writer.flush(strict=strict)
@@ -0,0 +1,138 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+_MISSING = object()
+
+
+class TTLCache:
+    """Thread-safe, size-bounded LRU cache whose entries expire after a TTL.
+
+    Caches are process-local: every gunicorn worker keeps its own copy, so
+    writers must call ``invalidate`` and the TTL bounds how long another
+    worker can serve a stale entry.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING:
+                self.misses += 1
+                return default
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl: float = None):
+        ttl = self.ttl if ttl is None else ttl
+        if ttl <= 0 or self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def invalidate(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hitRate": round(self.hits / lookups, 4) if lookups else 0,
+            }
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class ResultCache(TTLCache):
+    """TTLCache for computed results, tagged with the data they depend on.
+
+    ``get_or_compute`` is single-flight: concurrent misses on a key wait for
+    the first caller's computation instead of each running it, so an
+    expiry does not stampede the database. ``invalidate_tags`` drops every
+    entry computed from a tag; a result whose tags were invalidated while it
+    was being computed is returned but not stored. Invalidation is
+    process-local like the rest of TTLCache.
+    """
+
+    def __init__(self, maxsize: int = 256, ttl: float = 30):
+        super().__init__(maxsize=maxsize, ttl=ttl)
+        self._tagged = {}
+        self._generations = {}
+        self._flights = {}
+        self._flight_lock = threading.Lock()
+
+    def get_or_compute(self, key, compute, tags=()):
+        value = self.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+
+        with self._flight_lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+                generations = [self._generations.get(tag, 0) for tag in tags]
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            flight.value = compute()
+        except BaseException as exc:
+            flight.error = exc
+            raise
+        finally:
+            with self._flight_lock:
+                del self._flights[key]
+                fresh = generations == [self._generations.get(tag, 0) for tag in tags]
+                if flight.error is None and fresh:
+                    self.set(key, flight.value)
+                    for tag in tags:
+                        keys = self._tagged.setdefault(tag, set())
+                        keys.add(key)
+                        if len(keys) > 2 * self.maxsize:
+                            with self._lock:  # forget evicted entries
+                                keys.intersection_update(list(self._data))
+            flight.done.set()
+        return flight.value
+
+    def invalidate_tags(self, *tags):
+        with self._flight_lock:
+            for tag in tags:
+                self._generations[tag] = self._generations.get(tag, 0) + 1
+                for key in self._tagged.pop(tag, ()):
+                    self.invalidate(key)
@@ -0,0 +1,231 @@
+from datetime import timezone
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from bson import ObjectId
+
+from .impact_models import IMPACT_FIELDS
+
+
+BATCH_SIZE = 10000
+
+FORMATS = {"parquet": ".parquet", "arrow": ".arrows"}  # arrow: IPC stream format
+
+TIMESTAMP = pa.timestamp("ms", tz="UTC")
+
+
+def _oid(value):
+    return str(value) if isinstance(value, ObjectId) else None
+
+
+def _issue_row(doc: dict) -> dict:
+    location = doc.get("location") or {}
+    return {
+        "id": str(doc["_id"]),
+        "title": doc.get("title"),
+        "description": doc.get("description"),
+        "category": doc.get("category"),
+        "status": doc.get("status"),
+        "impactType": doc.get("impactType"),
+        "sdgTags": doc.get("sdgTags") or [],
+        "imageUrl": doc.get("imageUrl"),
+        "lat": _float(location.get("lat")),
+        "lng": _float(location.get("lng")),
+        "address": location.get("address"),
+        "reportedBy": _oid(doc.get("reportedBy")),
+        "assignedTo": _oid(doc.get("assignedTo")),
+        "createdAt": doc.get("createdAt"),
+        "updatedAt": doc.get("updatedAt"),
+        "closedAt": doc.get("closedAt"),
+    }
+
+
+def _audit_row(doc: dict) -> dict:
+    return {
+        "id": str(doc["_id"]),
+        "issueId": _oid(doc.get("issueId")),
+        "action": doc.get("action"),
+        "performedBy": _oid(doc.get("performedBy")),
+        "timestamp": doc.get("timestamp"),
+    }
+
+
+def _impact_row(doc: dict) -> dict:
+    row = {
+        "id": str(doc["_id"]),
+        "issueId": _oid(doc.get("issueId")),
+        "userId": _oid(doc.get("userId")),
+        "modelVersion": doc.get("modelVersion"),
+        "computedAt": doc["_id"].generation_time,
+    }
+    for field in IMPACT_FIELDS:
+        row[field] = _float(doc.get(field))
+    return row
+
+
+def _float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class Dataset:
+    """A collection exported with a fixed Arrow schema, one row per document."""
+
+    def __init__(self, collection: str, schema: pa.Schema, to_row, time_field: str, projection: dict = None, filters: tuple = ()):
+        self.collection = collection
+        self.schema = schema
+        self.to_row = to_row
+        self.time_field = time_field
+        self.projection = projection
+        self.filters = filters  # fields that can be matched exactly, e.g. ?status=
+
+    def time_query(self, start=None, end=None) -> dict:
+        """Filter on the dataset's time field; bounds are naive UTC datetimes, end exclusive."""
+        bounds = {}
+        if self.time_field == "_id":
+            # impact_metrics has no timestamp; ObjectIds carry their creation time
+            if start:
+                bounds["$gte"] = ObjectId.from_datetime(start.replace(tzinfo=timezone.utc))
+            if end:
+                bounds["$lt"] = ObjectId.from_datetime(end.replace(tzinfo=timezone.utc))
+        else:
+            if start:
+                bounds["$gte"] = start
+            if end:
+                bounds["$lt"] = end
+        return {self.time_field: bounds} if bounds else {}
+
+
+DATASETS = {
+    "issues": Dataset(
+        "issues",
+        pa.schema([
+            ("id", pa.string()),
+            ("title", pa.string()),
+            ("description", pa.string()),
+            ("category", pa.string()),
+            ("status", pa.string()),
+            ("impactType", pa.string()),
+            ("sdgTags", pa.list_(pa.int32())),
+            ("imageUrl", pa.string()),
+            ("lat", pa.float64()),
+            ("lng", pa.float64()),
+            ("address", pa.string()),
+            ("reportedBy", pa.string()),
+            ("assignedTo", pa.string()),
+            ("createdAt", TIMESTAMP),
+            ("updatedAt", TIMESTAMP),
+            ("closedAt", TIMESTAMP),
+        ]),
+        _issue_row,
+        "createdAt",
+        {"geo": 0},
+        ("status", "category"),
+    ),
+    "audit_logs": Dataset(
+        "audit_logs",
+        pa.schema([
+            ("id", pa.string()),
+            ("issueId", pa.string()),
+            ("action", pa.string()),
+            ("performedBy", pa.string()),
+            ("timestamp", TIMESTAMP),
+        ]),
+        _audit_row,
+        "timestamp",
+    ),
+    "impact_metrics": Dataset(
+        "impact_metrics",
+        pa.schema(
+            [
+                ("id", pa.string()),
+                ("issueId", pa.string()),
+                ("userId", pa.string()),
+                ("modelVersion", pa.string()),
+                ("computedAt", TIMESTAMP),
+            ]
+            + [(field, pa.float64()) for field in IMPACT_FIELDS]
+        ),
+        _impact_row,
+        "_id",
+    ),
+}
+
+
+def record_batches(database, dataset: Dataset, query: dict = None, batch_size: int = BATCH_SIZE):
+    """Yield the dataset as RecordBatches of up to `batch_size` rows, in _id order.
+
+    Only one cursor batch and one record batch are held at a time, so
+    memory does not grow with the size of the collection.
+    """
+    cursor = database[dataset.collection].find(query or {}, dataset.projection).sort("_id", 1).batch_size(batch_size)
+    rows = []
+    for doc in cursor:
+        rows.append(dataset.to_row(doc))
+        if len(rows) >= batch_size:
+            yield pa.RecordBatch.from_pylist(rows, schema=dataset.schema)
+            rows = []
+    if rows:
+        yield pa.RecordBatch.from_pylist(rows, schema=dataset.schema)
+
+
+class _ChunkSink:
+    """Write-only file object that keeps what was written until drained."""
+
+    closed = False
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _writer(sink, schema: pa.Schema, fmt: str):
+    if fmt == "parquet":
+        return pq.ParquetWriter(sink, schema, compression="zstd")
+    if fmt == "arrow":
+        return pa.ipc.new_stream(sink, schema)
+    raise ValueError(f"Unknown export format: {fmt}")
+
+
+def write_export(database, dataset: Dataset, sink, fmt: str = "parquet", query: dict = None, batch_size: int = BATCH_SIZE) -> int:
+    """Write the dataset to `sink` (a path or binary file object); returns the row count.
+
+    Parquet gets one row group per record batch.
+    """
+    rows = 0
+    with _writer(sink, dataset.schema, fmt) as writer:
+        for batch in record_batches(database, dataset, query, batch_size):
+            writer.write_batch(batch)
+            rows += batch.num_rows
+    return rows
+
+
+def iter_export(database, dataset: Dataset, fmt: str = "parquet", query: dict = None, batch_size: int = BATCH_SIZE):
+    """The bytes of `write_export`, yielded after every record batch (for streaming responses)."""
+    sink = _ChunkSink()
+    writer = _writer(pa.PythonFile(sink, mode="w"), dataset.schema, fmt)
+    try:
+        for batch in record_batches(database, dataset, query, batch_size):
+            writer.write_batch(batch)
+            data = sink.drain()
+            if data:
+                yield data
+    finally:
+        writer.close()  # also when the client disconnects and the generator is closed
+    yield sink.drain()
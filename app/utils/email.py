@@ -3,6 +3,8 @@ import logging
 from sendgrid import SendGridAPIClient
 from sendgrid.helpers.mail import Mail
 
+from .jobs import register_job
+
 def send_email(to_email, subject, html_content):
     """
     Sends an email using SendGrid. 
@@ -30,3 +32,6 @@ def send_email(to_email, subject, html_content):
     except Exception as e:
         print(f"❌ Email sending failed: {str(e)}")
         return False
+
+
+register_job("email", send_email)
@@ -0,0 +1,103 @@
+import math
+
+from pymongo import UpdateOne
+
+from .. import db
+
+
+# Radius MongoDB uses for spherical GeoJSON distances, so distances computed
+# here agree with $geoNear (and cursors built from either are interchangeable).
+EARTH_RADIUS_M = 6378100.0
+
+# Longitude spacing of the vertices along a bbox's east-west edges
+BBOX_EDGE_STEP = 1.0
+
+
+def geo_point(location) -> dict | None:
+    """GeoJSON Point for an issue ``location`` ({"lat", "lng"}), or None if invalid.
+
+    Stored as ``geo`` next to the original location so the 2dsphere
+    index can serve distance queries; note GeoJSON order is [lng, lat].
+    """
+    if not isinstance(location, dict):
+        return None
+    try:
+        lat = float(location["lat"])
+        lng = float(location["lng"])
+    except (KeyError, TypeError, ValueError):
+        return None
+    if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+        return None
+    return {"type": "Point", "coordinates": [lng, lat]}
+
+
+def parse_bbox(raw: str) -> tuple:
+    """``min_lng,min_lat,max_lng,max_lat`` as floats; ValueError if malformed."""
+    parts = [float(v) for v in (raw or "").split(",")]
+    if len(parts) != 4:
+        raise ValueError("bbox needs four numbers")
+    min_lng, min_lat, max_lng, max_lat = parts
+    if not (-180 <= min_lng < max_lng <= 180 and -90 <= min_lat < max_lat <= 90):
+        raise ValueError("bbox out of range")
+    return min_lng, min_lat, max_lng, max_lat
+
+
+def bbox_polygon(bbox: tuple) -> dict:
+    """GeoJSON Polygon of a bbox, for $geoWithin on the ``geo`` 2dsphere index.
+
+    Polygon edges are great circles, so the east-west edges get a vertex
+    every BBOX_EDGE_STEP degrees to follow their parallel. The ring is
+    counter-clockwise under MongoDB's strict-winding CRS, which allows
+    boxes wider than a hemisphere.
+    """
+    min_lng, min_lat, max_lng, max_lat = bbox
+    if max_lng - min_lng >= 360:
+        max_lng = min_lng + 359.999999  # a full-width ring would fold onto its own meridian
+    steps = max(1, math.ceil((max_lng - min_lng) / BBOX_EDGE_STEP))
+    lngs = [min_lng + (max_lng - min_lng) * i / steps for i in range(steps + 1)]
+    ring = [[lng, min_lat] for lng in lngs] + [[lng, max_lat] for lng in reversed(lngs)]
+    ring.append(ring[0])
+    return {
+        "type": "Polygon",
+        "coordinates": [ring],
+        "crs": {"type": "name", "properties": {"name": "urn:x-mongodb:crs:strictwinding:EPSG:4326"}},
+    }
+
+
+def bbox_filter(raw: str) -> dict:
+    """Query filter on ``geo`` for a ``bbox`` request parameter; {} when absent."""
+    if not raw:
+        return {}
+    return {"geo": {"$geoWithin": {"$geometry": bbox_polygon(parse_bbox(raw))}}}
+
+
+def haversine_m(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    """Great-circle distance in meters."""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lng2 - lng1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(a)))
+
+
+def migrate_issue_geo(chunk_size: int = 1000) -> dict:
+    """Backfill ``geo`` on issues stored before it existed.
+
+    Issues are read in chunks and updated with unordered bulk writes;
+    issues whose location cannot be converted are counted and left alone.
+    """
+    migrated = skipped = 0
+    operations = []
+    cursor = db.issues.find({"geo": {"$exists": False}}, {"location": 1}).batch_size(chunk_size)
+    for issue in cursor:
+        point = geo_point(issue.get("location"))
+        if point is None:
+            skipped += 1
+            continue
+        operations.append(UpdateOne({"_id": issue["_id"]}, {"$set": {"geo": point}}))
+        if len(operations) >= chunk_size:
+            migrated += db.issues.bulk_write(operations, ordered=False).modified_count
+            operations = []
+    if operations:
+        migrated += db.issues.bulk_write(operations, ordered=False).modified_count
+    return {"migrated": migrated, "skipped": skipped}
@@ -0,0 +1,267 @@
+import logging
+import math
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
+
+from .. import db
+from .geo import EARTH_RADIUS_M, haversine_m
+from .jobs import register_job
+
+
+logger = logging.getLogger(__name__)
+
+# Cluster parameters per consumer. eps_m is the DBSCAN neighbourhood radius,
+# min_samples the neighbours (including itself) a core issue needs, limit
+# how many of the largest clusters are kept. Overridable via HOTSPOT_PROFILES.
+DEFAULT_PROFILES = {
+    "recurring": {"eps_m": 60, "min_samples": 4, "limit": None},  # admin structural problems
+    "nearby": {"eps_m": 500, "min_samples": 3, "limit": 20},  # public map hotspots
+    "analytics": {"eps_m": 500, "min_samples": 2, "limit": 10},  # admin dashboard
+}
+
+HOTSPOT_FIELDS = {"location": 1, "category": 1, "status": 1, "title": 1, "createdAt": 1}
+
+_settings = {"profiles": DEFAULT_PROFILES, "max_age": 900, "workers": 2, "lease": 600, "window_days": 365, "inline": True}
+_last_requested = {}
+
+
+def init_hotspots(app):
+    profiles = {name: dict(params) for name, params in DEFAULT_PROFILES.items()}
+    for name, params in app.config["HOTSPOT_PROFILES"].items():
+        profiles.setdefault(name, {}).update(params)
+    _settings.update(
+        profiles=profiles,
+        max_age=app.config["HOTSPOT_MAX_AGE"],
+        workers=app.config["HOTSPOT_WORKERS"],
+        window_days=app.config["HOTSPOT_WINDOW_DAYS"],
+        inline=app.config["JOBS_MODE"] == "inline",
+    )
+
+
+def dbscan(points: list, eps_m: float, min_samples: int) -> list:
+    """DBSCAN over haversine distance; returns clusters as lists of point indices.
+
+    Points are bucketed into a grid of eps-sized cells (the longitude step
+    is sized for the highest latitude present, so cells are never narrower
+    than eps), which limits each neighbour search to the 3x3 cells around
+    a point. Noise points are dropped.
+    """
+    if not points:
+        return []
+    dlat = math.degrees(eps_m / EARTH_RADIUS_M)
+    max_cos = max(math.cos(math.radians(max(abs(lat) for lat, _ in points))), 1e-6)
+    dlng = dlat / max_cos
+    keys = [(math.floor(lat / dlat), math.floor(lng / dlng)) for lat, lng in points]
+    cells = {}
+    for i, key in enumerate(keys):
+        cells.setdefault(key, []).append(i)
+
+    def neighbours(i):
+        lat, lng = points[i]
+        cell_lat, cell_lng = keys[i]
+        found = []
+        for di in (-1, 0, 1):
+            for dj in (-1, 0, 1):
+                for j in cells.get((cell_lat + di, cell_lng + dj), ()):
+                    if haversine_m(lat, lng, *points[j]) <= eps_m:
+                        found.append(j)
+        return found
+
+    noise = -1
+    labels = [None] * len(points)
+    clusters = []
+    for i in range(len(points)):
+        if labels[i] is not None:
+            continue
+        seeds = neighbours(i)
+        if len(seeds) < min_samples:
+            labels[i] = noise
+            continue
+        label = len(clusters)
+        members = []
+        clusters.append(members)
+        while seeds:
+            j = seeds.pop()
+            if labels[j] == noise:
+                labels[j] = label  # border point
+                members.append(j)
+            if labels[j] is not None:
+                continue
+            labels[j] = label
+            members.append(j)
+            more = neighbours(j)
+            if len(more) >= min_samples:
+                seeds.extend(more)
+    return clusters
+
+
+def _cluster_profile(points: list, params: dict) -> list:
+    return dbscan(points, params["eps_m"], params["min_samples"])
+
+
+def _summarize(members: list, issues: list, points: list, profile: str, run_id: ObjectId, computed_at: datetime) -> dict:
+    lat = sum(points[i][0] for i in members) / len(members)
+    lng = sum(points[i][1] for i in members) / len(members)
+    newest = sorted((issues[i] for i in members), key=lambda i: i.get("createdAt") or datetime.min, reverse=True)
+    return {
+        "profile": profile,
+        "runId": run_id,
+        "computedAt": computed_at,
+        "center": {"lat": lat, "lng": lng},
+        "radiusM": round(max(haversine_m(lat, lng, *points[i]) for i in members), 1),
+        "issueCount": len(members),
+        "issueIds": [issue["_id"] for issue in newest],
+        "categories": sorted({issue.get("category") for issue in newest if issue.get("category")}),
+        "statuses": sorted({issue.get("status") for issue in newest if issue.get("status")}),
+        "recentIssues": [{"title": issue.get("title"), "category": issue.get("category")} for issue in newest[:3]],
+    }
+
+
+def compute_hotspots(lease_lost: threading.Event = None) -> dict:
+    """Cluster the open and recent issues for each profile and replace the stored hotspots.
+
+    Issues that are not closed, or were reported in the last
+    HOTSPOT_WINDOW_DAYS days, are read once; the profiles are clustered in
+    parallel in a process pool (HOTSPOT_WORKERS, 0 runs them in this
+    process). Each profile's new run is inserted before the previous one
+    is deleted, and readers only look at the newest run, so a refresh is
+    never half-visible. Nothing is written once `lease_lost` is set.
+    """
+    since = datetime.utcnow() - timedelta(days=_settings["window_days"])
+    query = {"$or": [{"status": {"$ne": "CLOSED"}}, {"createdAt": {"$gte": since}}]}
+    issues, points = [], []
+    for issue in db.issues.find(query, HOTSPOT_FIELDS):
+        location = issue.get("location") or {}
+        try:
+            points.append((float(location["lat"]), float(location["lng"])))
+        except (KeyError, TypeError, ValueError):
+            continue
+        issues.append(issue)
+
+    profiles = _settings["profiles"]
+    if _settings["workers"] > 0 and len(profiles) > 1:
+        # spawn: forking a threaded web process is unsafe
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=min(_settings["workers"], len(profiles)), mp_context=context) as pool:
+            futures = {name: pool.submit(_cluster_profile, points, params) for name, params in profiles.items()}
+            results = {name: future.result() for name, future in futures.items()}
+    else:
+        results = {name: _cluster_profile(points, params) for name, params in profiles.items()}
+
+    summary = {}
+    for name, clusters in results.items():
+        if lease_lost is not None and lease_lost.is_set():
+            raise RuntimeError("Hotspot lease lost to another process")
+        clusters.sort(key=len, reverse=True)
+        limit = profiles[name].get("limit")
+        if limit:
+            clusters = clusters[:limit]
+        run_id, computed_at = ObjectId(), datetime.utcnow()
+        docs = [_summarize(members, issues, points, name, run_id, computed_at) for members in clusters]
+        for rank, doc in enumerate(docs):
+            doc["rank"] = rank
+        if docs:
+            db.hotspots.insert_many(docs)
+        else:
+            # Empty marker so readers know the profile was computed
+            db.hotspots.insert_one({"profile": name, "runId": run_id, "computedAt": computed_at, "rank": None})
+        db.hotspots.delete_many({"profile": name, "runId": {"$ne": run_id}})
+        summary[name] = len(docs)
+    return summary
+
+
+def _renew_lease(owner: str, done: threading.Event, lost: threading.Event):
+    """Extend our lease every third of its length until `done`; set `lost` if it was taken."""
+    lease = _settings["lease"]
+    while not done.wait(lease / 3):
+        result = db.job_locks.update_one(
+            {"_id": "hotspots", "owner": owner},
+            {"$set": {"leaseUntil": datetime.utcnow() + timedelta(seconds=lease)}},
+        )
+        if not result.matched_count:
+            lost.set()
+            return
+
+
+def refresh_hotspots():
+    """compute_hotspots under a cluster-wide lease, so one process runs it at a time.
+
+    The lease is renewed while the clustering runs and released only if
+    this run still owns it.
+    """
+    now, owner = datetime.utcnow(), str(ObjectId())
+    try:
+        db.job_locks.find_one_and_update(
+            {"_id": "hotspots", "leaseUntil": {"$lt": now}},
+            {"$set": {"leaseUntil": now + timedelta(seconds=_settings["lease"]), "owner": owner}},
+            upsert=True,
+        )
+    except DuplicateKeyError:
+        return None  # another process holds the lease
+    done, lost = threading.Event(), threading.Event()
+    renewer = threading.Thread(target=_renew_lease, args=(owner, done, lost), name="hotspots-lease", daemon=True)
+    renewer.start()
+    try:
+        return compute_hotspots(lost)
+    finally:
+        done.set()
+        renewer.join()
+        db.job_locks.update_one({"_id": "hotspots", "owner": owner}, {"$set": {"leaseUntil": datetime.utcnow()}})
+
+
+register_job("hotspots", refresh_hotspots)  # runs spilled jobs from before refreshes got their own thread
+
+_refresh_thread = None
+_refresh_lock = threading.Lock()
+
+
+def _request_refresh(profile: str):
+    """Start a refresh, at most once per process per HOTSPOT_MAX_AGE for `profile`.
+
+    It runs on its own thread rather than the job queue, so a long
+    clustering never holds up notification jobs (inline job mode runs it
+    in the caller, which keeps tests deterministic).
+    """
+    global _refresh_thread
+    if time.monotonic() - _last_requested.get(profile, -math.inf) <= _settings["max_age"]:
+        return
+    _last_requested[profile] = time.monotonic()
+    if _settings["inline"]:
+        refresh_hotspots()
+        return
+    with _refresh_lock:
+        if _refresh_thread is None or not _refresh_thread.is_alive():
+            _refresh_thread = threading.Thread(target=_refresh_safely, name="hotspots", daemon=True)
+            _refresh_thread.start()
+
+
+def _refresh_safely():
+    try:
+        refresh_hotspots()
+    except Exception:
+        logger.exception("Hotspot refresh failed")
+
+
+def stored_hotspots(profile: str) -> list:
+    """Newest stored clusters for `profile`, largest first.
+
+    Requests never cluster themselves: a stale or missing run is refreshed
+    in the background and the last stored run is served meanwhile (nothing,
+    for a profile that was never computed; run ``python maintenance.py
+    compute-hotspots`` after deploying to avoid that).
+    """
+    latest = db.hotspots.find_one({"profile": profile}, {"runId": 1, "computedAt": 1}, sort=[("computedAt", -1)])
+    if latest is None or datetime.utcnow() - latest["computedAt"] > timedelta(seconds=_settings["max_age"]):
+        _request_refresh(profile)
+    if latest is None:
+        # Inline mode (tests) has already computed it
+        latest = db.hotspots.find_one({"profile": profile}, {"runId": 1, "computedAt": 1}, sort=[("computedAt", -1)])
+        if latest is None:
+            return []
+    return list(db.hotspots.find({"profile": profile, "runId": latest["runId"], "rank": {"$ne": None}}).sort("rank", 1))
@@ -0,0 +1,94 @@
+from datetime import datetime
+
+import numpy as np
+from pymongo import UpdateOne
+
+from .. import db
+from .impact_engine import rebuild_global_aggregates, rebuild_monthly_impact, repair_user_impact
+from .impact_models import IMPACT_FIELDS, ImpactModel, get_impact_model
+
+
+RECOMPUTE_FIELDS = {"category": 1, "createdAt": 1, "reportedAt": 1, "closedAt": 1, "updatedAt": 1, "reportedBy": 1}
+
+
+def compute_chunk(issues: list, model: ImpactModel) -> np.ndarray:
+    """Impact matrix (one row per issue, one column per IMPACT_FIELDS entry).
+
+    Uses the model's dispatch table as arrays, so it matches
+    calculate_impact: the close time is ``closedAt`` (falling back to the
+    last update for issues closed before it was recorded) and an issue
+    without a report time counts as open for zero hours.
+    """
+    constants, rates = np.asarray(model.constants), np.asarray(model.rates)
+    category_codes = np.fromiter((model.codes.get(i.get("category"), 0) for i in issues), dtype=np.intp, count=len(issues))
+    reported = np.array([i.get("createdAt") or i.get("reportedAt") for i in issues], dtype="datetime64[ms]")
+    closed = np.array([i.get("closedAt") or i.get("updatedAt") for i in issues], dtype="datetime64[ms]")
+    hours = np.nan_to_num((closed - reported) / np.timedelta64(1, "h"))
+
+    values = constants[category_codes] + rates[category_codes] * hours[:, None]
+    return np.round(values, 2)
+
+
+def recompute_impacts(chunk_size: int = 5000, stale_only: bool = False) -> dict:
+    """Recompute impact_metrics for closed issues with the active impact model.
+
+    Closed issues are streamed in chunks, each chunk is computed as one
+    NumPy expression and written back with a single unordered bulk_write
+    of upserts keyed by ``issueId``. With `stale_only`, only issues whose
+    metrics were computed by another model version are touched. Global
+    aggregates, the monthly rollup and per-user totals are rebuilt at the end.
+    """
+    model = get_impact_model()
+    recomputed_at = datetime.utcnow()
+    processed = 0
+
+    for chunk in _stale_chunks(model.version, chunk_size) if stale_only else _closed_chunks(chunk_size):
+        processed += _write_chunk(chunk, model, recomputed_at)
+
+    aggregates = rebuild_global_aggregates()
+    rebuild_monthly_impact()
+    repair_user_impact()
+    return {"recomputed": processed, "modelVersion": model.version, "aggregates": aggregates}
+
+
+def _closed_chunks(chunk_size: int):
+    chunk = []
+    for issue in db.issues.find({"status": "CLOSED"}, RECOMPUTE_FIELDS).batch_size(chunk_size):
+        chunk.append(issue)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _stale_chunks(version: str, chunk_size: int):
+    # Collect the ids first: the writes below change what the query matches
+    stale = db.impact_metrics.find({"modelVersion": {"$ne": version}}, {"issueId": 1}).batch_size(chunk_size)
+    issue_ids = [m["issueId"] for m in stale]
+    for start in range(0, len(issue_ids), chunk_size):
+        query = {"_id": {"$in": issue_ids[start:start + chunk_size]}, "status": "CLOSED"}
+        chunk = list(db.issues.find(query, RECOMPUTE_FIELDS))
+        if chunk:
+            yield chunk
+
+
+def _write_chunk(issues: list, model: ImpactModel, recomputed_at: datetime) -> int:
+    values = compute_chunk(issues, model).tolist()
+    operations = [
+        UpdateOne(
+            {"issueId": issue["_id"]},
+            {
+                "$set": {
+                    **dict(zip(IMPACT_FIELDS, row)),
+                    "userId": issue.get("reportedBy"),
+                    "modelVersion": model.version,
+                    "recomputedAt": recomputed_at,
+                }
+            },
+            upsert=True,
+        )
+        for issue, row in zip(issues, values)
+    ]
+    db.impact_metrics.bulk_write(operations, ordered=False)
+    return len(operations)
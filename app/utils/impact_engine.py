@@ -1,69 +1,300 @@
+import random
 from datetime import datetime
 
 from .. import db
 from bson import ObjectId
+from pymongo import DeleteOne, ReplaceOne, ReturnDocument
+from pymongo.errors import DuplicateKeyError
 
+from .impact_models import IMPACT_FIELDS, ImpactModel, get_impact_model
+from .jobs import register_job
+from .results import invalidate_results
 
-def calculate_impact(issue: dict, closed_at: datetime):
+
+def duration_hours(issue: dict, closed_at: datetime) -> float:
     reported_at = issue.get("createdAt") or issue.get("reportedAt")
     if isinstance(reported_at, str):
         reported_at = datetime.fromisoformat(reported_at)
-    duration_hours = (closed_at - reported_at).total_seconds() / 3600 if reported_at else 0
-
-    category = issue.get("category")
-    impact = {
-        "waterSaved": 0,
-        "wasteRemoved": 0,
-        "co2Reduced": 0,
-        "fuelSaved": 0,
-        "safetyScore": 0,
-    }
+    return (closed_at - reported_at).total_seconds() / 3600 if reported_at else 0
+
+
+def calculate_impact(issue: dict, closed_at: datetime, model: ImpactModel = None):
+    model = model or get_impact_model()
+    return model.impact(issue.get("category"), duration_hours(issue, closed_at))
+
+
+# impact key -> running total in the global_aggregates documents
+AGGREGATE_FIELDS = {
+    "waterSaved": "totalWaterSaved",
+    "co2Reduced": "totalCo2Reduced",
+    "wasteRemoved": "totalWasteRemoved",
+    "fuelSaved": "totalFuelSaved",
+}
+AGGREGATE_TOTALS = [*AGGREGATE_FIELDS.values(), "totalIssuesResolved", "citizenParticipationCount"]
+
+# Number of "global:<n>" counter documents increments are spread over
+_aggregate_shards = 1
+
+
+def init_impact(app):
+    global _aggregate_shards
+    _aggregate_shards = max(1, app.config["IMPACT_AGGREGATE_SHARDS"])
+
+
+def increment_global_aggregates(impact: dict, resolved: int = 1):
+    """Atomically add one closed issue's impact to the global totals.
+
+    Each call is a single ``$inc`` upsert on one of the shard documents,
+    so concurrent closes never lose an update; with more than one shard
+    they also stop contending for the same document.
+    """
+    inc = {total: impact.get(field, 0) for field, total in AGGREGATE_FIELDS.items()}
+    inc["totalIssuesResolved"] = resolved
+    shard = random.randrange(_aggregate_shards)
+    db.global_aggregates.update_one(
+        {"_id": f"global:{shard}"},
+        {"$inc": inc, "$set": {"updatedAt": datetime.utcnow()}},
+        upsert=True,
+    )
+    invalidate_results("impact")
+
+
+def read_global_aggregates() -> dict:
+    """Sum every counter document (shards and any legacy single document)."""
+    group = {"_id": None, **{total: {"$sum": f"${total}"} for total in AGGREGATE_TOTALS}}
+    group["updatedAt"] = {"$max": "$updatedAt"}
+    rows = list(db.global_aggregates.aggregate([{"$group": group}]))
+    if not rows:
+        return {}
+    totals = rows[0]
+    totals.pop("_id", None)
+    return totals
+
+
+def rebuild_global_aggregates() -> dict:
+    """Recompute the global totals from impact_metrics.
+
+    The result replaces all counter documents with a single ``global:0``.
+    ``citizenParticipationCount`` is not derived from metrics and is
+    carried over. Increments that land while the rebuild runs are lost,
+    so run it while closes are quiet.
+    """
+    group = {"_id": None, **{total: {"$sum": f"${field}"} for field, total in AGGREGATE_FIELDS.items()}}
+    group["totalIssuesResolved"] = {"$sum": 1}
+    rows = list(db.impact_metrics.aggregate([{"$group": group}]))
+    totals = rows[0] if rows else {total: 0 for total in AGGREGATE_FIELDS.values()}
+    totals.pop("_id", None)
+    totals.setdefault("totalIssuesResolved", 0)
+    totals["citizenParticipationCount"] = read_global_aggregates().get("citizenParticipationCount", 0)
+    totals["updatedAt"] = datetime.utcnow()
+
+    db.global_aggregates.delete_many({"_id": {"$ne": "global:0"}})
+    db.global_aggregates.replace_one({"_id": "global:0"}, totals, upsert=True)
+    invalidate_results("impact")
+    return totals
+
+
+# Impact fields summed per month in impact_monthly
+MONTHLY_FIELDS = ["waterSaved", "co2Reduced", "wasteRemoved", "fuelSaved"]
 
-    if category == "Water Leakage":
-        liters_per_minute = 15
-        water_saved = liters_per_minute * 60 * duration_hours
-        impact["waterSaved"] = round(water_saved, 2)
 
-    if category == "Garbage Dump":
-        avg_weight = 25  # kg
-        impact["wasteRemoved"] = avg_weight
-        impact["co2Reduced"] = round(avg_weight * 0.8, 2)
+def increment_monthly_impact(impact: dict, reported_at: datetime):
+    """Add one issue's impact to the rollup of the month it was reported in."""
+    db.impact_monthly.update_one(
+        {"_id": f"{reported_at.year}-{reported_at.month:02d}"},
+        {
+            "$inc": {field: impact.get(field, 0) for field in MONTHLY_FIELDS},
+            "$set": {"year": reported_at.year, "month": reported_at.month},
+        },
+        upsert=True,
+    )
 
-    if category == "Pothole":
-        # treat as emission reduction proxy
-        impact["co2Reduced"] = round(10 * duration_hours, 2)
 
-    if category == "Traffic Signal Failure":
-        impact["fuelSaved"] = round(0.3 * duration_hours, 2)
+def rebuild_monthly_impact() -> int:
+    """Backfill impact_monthly from impact_metrics joined to their issues.
 
-    if category == "Broken Streetlight":
-        impact["safetyScore"] = 10
+    Runs the full join once, then replaces each month in place and deletes
+    only months that existed before and no longer occur, so readers never
+    see an empty rollup and months the listeners create meanwhile are
+    kept. Returns the number of months written.
+    """
+    existing = {doc["_id"] for doc in db.impact_monthly.find({}, {"_id": 1})}
+    pipeline = [
+        {
+            "$lookup": {
+                "from": "issues",
+                "localField": "issueId",
+                "foreignField": "_id",
+                "as": "issue",
+            }
+        },
+        {"$unwind": "$issue"},
+        {"$match": {"issue.createdAt": {"$type": "date"}}},
+        {
+            "$group": {
+                "_id": {
+                    "year": {"$year": "$issue.createdAt"},
+                    "month": {"$month": "$issue.createdAt"},
+                },
+                **{field: {"$sum": f"${field}"} for field in MONTHLY_FIELDS},
+            }
+        },
+    ]
+    operations = []
+    for row in db.impact_metrics.aggregate(pipeline):
+        year, month = row["_id"]["year"], row["_id"]["month"]
+        key = f"{year}-{month:02d}"
+        existing.discard(key)
+        operations.append(
+            ReplaceOne(
+                {"_id": key},
+                {"year": year, "month": month, **{field: row.get(field, 0) for field in MONTHLY_FIELDS}},
+                upsert=True,
+            )
+        )
+    months = len(operations)
+    operations += [DeleteOne({"_id": key}) for key in existing]
 
-    return impact
+    if operations:
+        db.impact_monthly.bulk_write(operations, ordered=False)
+    return months
 
 
-def persist_impact(issue_id: ObjectId, impact: dict, user_id: ObjectId | None = None):
+def increment_user_impact(user_id: ObjectId, impact: dict):
+    """Add one closed issue's impact to its reporter's totals in user_impact."""
+    db.user_impact.update_one(
+        {"_id": user_id},
+        {"$inc": {field: impact.get(field, 0) for field in IMPACT_FIELDS}},
+        upsert=True,
+    )
+
+
+def repair_user_impact(dry_run: bool = False) -> dict:
+    """Check user_impact against impact_metrics and fix any drift.
+
+    Expected totals are summed per reporter (joined through the issue, so
+    metrics written before ``userId`` was stored count too). Users whose
+    stored totals differ are rewritten and stale documents removed, unless
+    `dry_run` is set. Returns the number of users checked and repaired.
+    """
+    pipeline = [
+        {
+            "$lookup": {
+                "from": "issues",
+                "localField": "issueId",
+                "foreignField": "_id",
+                "as": "issue",
+            }
+        },
+        {"$unwind": "$issue"},
+        {"$group": {"_id": "$issue.reportedBy", **{field: {"$sum": f"${field}"} for field in IMPACT_FIELDS}}},
+    ]
+    expected = {row["_id"]: row for row in db.impact_metrics.aggregate(pipeline) if row["_id"] is not None}
+    stored = {doc["_id"]: doc for doc in db.user_impact.find()}
+
+    drifted = [
+        user_id
+        for user_id, row in expected.items()
+        if any(abs(row.get(field, 0) - stored.get(user_id, {}).get(field, 0)) > 1e-6 for field in IMPACT_FIELDS)
+    ]
+    stale = [user_id for user_id in stored if user_id not in expected]
+
+    if not dry_run:
+        operations = [ReplaceOne({"_id": user_id}, expected[user_id], upsert=True) for user_id in drifted]
+        operations += [DeleteOne({"_id": user_id}) for user_id in stale]
+        if operations:
+            db.user_impact.bulk_write(operations, ordered=False)
+
+    return {"checked": len(expected), "repaired": len(drifted) + len(stale)}
+
+
+def _claim_rollup(metrics_id: ObjectId, rollup: str) -> bool:
+    """Mark `rollup` as applied for a metrics row; False if it already was.
+
+    Rows written before ``applied`` existed were counted in full when they
+    were stored and are never claimed again.
+    """
+    result = db.impact_metrics.update_one(
+        {"_id": metrics_id, "applied": {"$exists": True, "$ne": rollup}},
+        {"$addToSet": {"applied": rollup}},
+    )
+    return result.modified_count == 1
+
+
+def persist_impact(
+    issue_id: ObjectId,
+    impact: dict,
+    user_id: ObjectId | None = None,
+    reported_at: datetime | None = None,
+    model_version: str | None = None,
+):
+    """Store the impact row of an issue and add it to the rollups, once per issue.
+
+    The row is upserted on ``issueId`` (unique) and records in ``applied``
+    which rollups it has been added to. Each rollup is claimed with a
+    conditional update before its ``$inc`` and released again if the
+    ``$inc`` fails, so a retried or replayed impact job adds exactly the
+    rollups that are still missing, using the values stored on the row.
+    """
     metrics_doc = {
-        "issueId": issue_id,
+        "userId": user_id,
+        "modelVersion": model_version,
+        "applied": [],
         **impact,
     }
-    db.impact_metrics.insert_one(metrics_doc)
-
-    # Update global aggregates (single document pattern)
-    agg = db.global_aggregates.find_one({}) or {
-        "totalWaterSaved": 0,
-        "totalCo2Reduced": 0,
-        "totalWasteRemoved": 0,
-        "totalFuelSaved": 0,
-        "totalIssuesResolved": 0,
-        "citizenParticipationCount": 0,
-    }
-    agg["totalWaterSaved"] += impact.get("waterSaved", 0)
-    agg["totalCo2Reduced"] += impact.get("co2Reduced", 0)
-    agg["totalWasteRemoved"] += impact.get("wasteRemoved", 0)
-    agg["totalFuelSaved"] += impact.get("fuelSaved", 0)
-    agg["totalIssuesResolved"] += 1
+    try:
+        row = db.impact_metrics.find_one_and_update(
+            {"issueId": issue_id},
+            {"$setOnInsert": metrics_doc},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+    except DuplicateKeyError:
+        row = db.impact_metrics.find_one({"issueId": issue_id})  # a concurrent run inserted it first
+    stored = {field: row.get(field, 0) for field in IMPACT_FIELDS}
+
+    rollups = {"global": lambda: increment_global_aggregates(stored)}
+    if isinstance(reported_at, datetime):
+        rollups["monthly"] = lambda: increment_monthly_impact(stored, reported_at)
+    if row.get("userId") is not None:
+        rollups["user"] = lambda: increment_user_impact(row["userId"], stored)
+
+    for rollup, increment in rollups.items():
+        if not _claim_rollup(row["_id"], rollup):
+            continue
+        try:
+            increment()
+        except Exception:
+            db.impact_metrics.update_one({"_id": row["_id"]}, {"$pull": {"applied": rollup}})
+            raise
+
+
+def remove_impact(issue: dict):
+    """Delete a deleted issue's impact row and subtract it from the rollups it was added to.
+
+    Rows without ``applied`` predate it and were counted everywhere; their
+    reporter comes from the issue, as in repair_user_impact.
+    """
+    row = db.impact_metrics.find_one_and_delete({"issueId": issue["_id"]})
+    if row is None:
+        return
+    negated = {field: -row.get(field, 0) for field in IMPACT_FIELDS}
+    applied = row.get("applied", ["global", "monthly", "user"])
+    if "global" in applied:
+        increment_global_aggregates(negated, resolved=-1)
+    reported_at = issue.get("createdAt")
+    if "monthly" in applied and isinstance(reported_at, datetime):
+        increment_monthly_impact(negated, reported_at)
+    user_id = row["userId"] if "applied" in row else row.get("userId") or issue.get("reportedBy")
+    if "user" in applied and user_id is not None:
+        increment_user_impact(user_id, negated)
+
 
-    db.global_aggregates.replace_one({}, agg, upsert=True)
+def record_impact(issue: dict, closed_at: datetime):
+    """Calculate and persist the impact of a closed issue."""
+    model = get_impact_model()
+    impact = calculate_impact(issue, closed_at, model)
+    persist_impact(issue["_id"], impact, issue.get("reportedBy"), issue.get("createdAt"), model.version)
 
 
+register_job("impact", record_impact)
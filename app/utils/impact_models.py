@@ -0,0 +1,160 @@
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+
+from pymongo.errors import PyMongoError
+
+from .. import db
+
+
+logger = logging.getLogger(__name__)
+
+IMPACT_FIELDS = ["waterSaved", "wasteRemoved", "co2Reduced", "fuelSaved", "safetyScore"]
+
+# Built-in model, used until a model is published to the impact_models
+# collection (or IMPACT_MODELS_FILE is set). Each impact is
+# constant + perHour * hours between report and close, rounded to 2 places.
+DEFAULT_MODEL = {
+    "version": "builtin-1",
+    "categories": {
+        "Water Leakage": {
+            "impact": {"waterSaved": {"constant": 0, "perHour": 15 * 60}},  # 15 liters per minute
+            "sdgTags": [6],
+            "impactType": "water",
+        },
+        "Garbage Dump": {
+            "impact": {"wasteRemoved": {"constant": 25, "perHour": 0}, "co2Reduced": {"constant": 25 * 0.8, "perHour": 0}},  # 25 kg average
+            "sdgTags": [11, 13],
+            "impactType": "waste",
+        },
+        "Broken Streetlight": {
+            "impact": {"safetyScore": {"constant": 10, "perHour": 0}},
+            "sdgTags": [5, 11],
+            "impactType": "safety",
+        },
+        "Pothole": {
+            "impact": {"co2Reduced": {"constant": 0, "perHour": 10}},  # emission reduction proxy
+            "sdgTags": [11],
+            "impactType": "emission",
+        },
+        "Traffic Signal Failure": {
+            "impact": {"fuelSaved": {"constant": 0, "perHour": 0.3}},
+            "sdgTags": [13],
+            "impactType": "fuel",
+        },
+    },
+}
+
+
+class ImpactModel:
+    """A model document compiled into a dispatch table.
+
+    Categories become row codes into `constants` and `rates` (one column
+    per IMPACT_FIELDS entry); row 0 is all zeros for unknown categories.
+    The per-issue path indexes a row, the batch path turns the same lists
+    into arrays, so both always compute with the same coefficients.
+    """
+
+    def __init__(self, doc: dict):
+        self.version = str(doc["version"])
+        self.codes = {}
+        self.constants = [[0.0] * len(IMPACT_FIELDS)]
+        self.rates = [[0.0] * len(IMPACT_FIELDS)]
+        self.sdg = {}
+        for category, spec in doc["categories"].items():
+            constants = [0.0] * len(IMPACT_FIELDS)
+            rates = [0.0] * len(IMPACT_FIELDS)
+            for field, coefficients in spec.get("impact", {}).items():
+                if field not in IMPACT_FIELDS:
+                    raise ValueError(f"Unknown impact field {field} for {category}")
+                column = IMPACT_FIELDS.index(field)
+                constants[column] = float(coefficients.get("constant", 0))
+                rates[column] = float(coefficients.get("perHour", 0))
+            self.codes[category] = len(self.constants)
+            self.constants.append(constants)
+            self.rates.append(rates)
+            self.sdg[category] = {"sdgTags": list(spec.get("sdgTags", [])), "impactType": spec.get("impactType")}
+
+    def impact(self, category: str, hours: float) -> dict:
+        row = self.codes.get(category, 0)
+        constants, rates = self.constants[row], self.rates[row]
+        return {field: round(constants[i] + rates[i] * hours, 2) for i, field in enumerate(IMPACT_FIELDS)}
+
+    def sdg_for(self, category: str) -> dict:
+        return self.sdg.get(category, {"sdgTags": [], "impactType": None})
+
+
+class ImpactModelRegistry:
+    """Holds the active ImpactModel and hot-reloads it.
+
+    The source is the newest document in the ``impact_models`` collection,
+    or a JSON file when `path` is set. At most every `reload_interval`
+    seconds, `current()` checks the source's version (or the file's mtime)
+    and recompiles only when it changed. A model that fails to load or
+    compile is logged and the previous one stays active.
+    """
+
+    def __init__(self, path: str = None, reload_interval: float = 60):
+        self.path = path
+        self.reload_interval = reload_interval
+        self.model = ImpactModel(DEFAULT_MODEL)
+        self._source_key = None
+        self._checked_at = None
+        self._lock = threading.Lock()
+
+    def current(self) -> ImpactModel:
+        if self._checked_at is None or time.monotonic() - self._checked_at >= self.reload_interval:
+            self.reload()
+        return self.model
+
+    def reload(self, force: bool = False) -> ImpactModel:
+        with self._lock:
+            self._checked_at = time.monotonic()
+            try:
+                key = self._source_version()
+                if key is not None and (force or key != self._source_key):
+                    self.model = ImpactModel(self._load())
+                    logger.info("Loaded impact model %s", self.model.version)
+                self._source_key = key
+            except (OSError, ValueError, KeyError, TypeError, PyMongoError):
+                logger.exception("Could not load impact model; keeping %s", self.model.version)
+            return self.model
+
+    def _source_version(self):
+        if self.path:
+            return os.path.getmtime(self.path)
+        doc = db.impact_models.find_one({}, {"version": 1}, sort=[("publishedAt", -1)])
+        return doc["version"] if doc else None
+
+    def _load(self) -> dict:
+        if self.path:
+            with open(self.path, encoding="utf-8") as f:
+                return json.load(f)
+        return db.impact_models.find_one({}, sort=[("publishedAt", -1)])
+
+
+registry = ImpactModelRegistry()
+
+
+def init_impact_models(app):
+    global registry
+    registry = ImpactModelRegistry(
+        path=app.config["IMPACT_MODELS_FILE"] or None,
+        reload_interval=app.config["IMPACT_MODEL_RELOAD_INTERVAL"],
+    )
+
+
+def get_impact_model() -> ImpactModel:
+    return registry.current()
+
+
+def publish_impact_model(doc: dict) -> str:
+    """Validate a model document and make it the newest in impact_models."""
+    model = ImpactModel(doc)
+    if db.impact_models.count_documents({"version": model.version}, limit=1):
+        raise ValueError(f"Impact model {model.version} already exists")
+    db.impact_models.insert_one({**doc, "version": model.version, "publishedAt": datetime.utcnow()})
+    return model.version
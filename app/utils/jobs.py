@@ -0,0 +1,219 @@
+import atexit
+import logging
+import queue
+import threading
+import time
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+from pymongo.errors import PyMongoError
+
+from .. import db
+
+
+logger = logging.getLogger(__name__)
+
+# Job name -> callable. Handlers register themselves at import time so a
+# spilled job can be replayed by any process from its name and arguments.
+_handlers = {}
+
+# Id of the job running on this thread, see current_job_id()
+_local = threading.local()
+
+
+def register_job(name: str, fn):
+    _handlers[name] = fn
+    return fn
+
+
+class JobQueue:
+    """In-process queue that runs request side effects on worker threads.
+
+    Jobs are ``(name, args, kwargs)`` tuples whose arguments must be BSON
+    encodable; each also gets an id, kept if it is spilled, that handlers
+    read with `current_job_id` to make their writes idempotent. A failing job is retried with exponential backoff; when it
+    keeps failing, or when the queue is full or the process shuts down,
+    the job is spilled to the ``job_spill`` collection. Idle workers
+    (from any process) lease spilled jobs with an atomic
+    find_one_and_update and delete the record only once the job has run,
+    so a job is never lost: if its worker dies, the lease expires after
+    `lease_timeout` seconds and another worker runs it again. The lease
+    is renewed when a worker starts the job, and a worker whose lease was
+    taken over meanwhile skips it. Handlers must still tolerate running
+    more than once. Jobs that exhausted
+    their retries stay there flagged ``failed`` for inspection.
+    ``inline`` mode runs every job synchronously in the caller, which
+    keeps tests deterministic.
+    """
+
+    def __init__(self, mode="thread", workers=2, max_size=10000, max_retries=3, retry_delay=0.5, poll_interval=5, lease_timeout=300):
+        self.mode = mode
+        self.workers = workers
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.poll_interval = poll_interval
+        self.lease_timeout = lease_timeout
+        self._queue = queue.Queue(maxsize=max_size)
+        self._threads = []
+        self._stopping = threading.Event()
+        self.stats = {"enqueued": 0, "completed": 0, "retried": 0, "spilled": 0, "failed": 0}
+
+    def start(self):
+        if self.mode != "thread" or self._threads:
+            return
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"jobs-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        atexit.register(self.shutdown)
+
+    def enqueue(self, name: str, *args, **kwargs):
+        if name not in _handlers:
+            raise KeyError(f"Unknown job {name}")
+        self.stats["enqueued"] += 1
+        job = (name, args, kwargs, 0, ObjectId(), None)
+        if self.mode == "inline":
+            self._execute(job)
+            return
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            self._spill(job)
+
+    def shutdown(self, timeout: float = 5):
+        """Stop the workers and persist anything still queued."""
+        self._stopping.set()
+        deadline = time.monotonic() + timeout
+        for thread in self._threads:
+            thread.join(max(0, deadline - time.monotonic()))
+        self._threads = []
+        while True:
+            try:
+                self._spill(self._queue.get_nowait())
+            except queue.Empty:
+                break
+
+    def _run(self):
+        while not self._stopping.is_set():
+            try:
+                job = self._queue.get(timeout=self.poll_interval)
+            except queue.Empty:
+                self._reclaim_spilled()
+                continue
+            self._execute(job)
+
+    def _execute(self, job):
+        name, args, kwargs, attempts, job_id, claimed_at = job
+        if claimed_at is not None:
+            claimed_at = self._renew_lease(job_id, claimed_at)
+            if claimed_at is None:
+                return  # waited past its lease and another worker has it now
+        outer_job_id, _local.job_id = current_job_id(), job_id  # inline jobs can nest
+        try:
+            while True:
+                try:
+                    _handlers[name](*args, **kwargs)
+                    self.stats["completed"] += 1
+                    if claimed_at is not None:
+                        self._release(job_id)
+                    return
+                except Exception as exc:
+                    attempts += 1
+                    if attempts > self.max_retries:
+                        logger.exception("Job %s failed after %d attempts", name, attempts)
+                        self.stats["failed"] += 1
+                        self._spill((name, args, kwargs, attempts, job_id, claimed_at), error=repr(exc))
+                        return
+                    self.stats["retried"] += 1
+                    time.sleep(self.retry_delay * 2 ** (attempts - 1))
+        finally:
+            _local.job_id = outer_job_id
+
+    def _renew_lease(self, job_id, claimed_at):
+        """Extend our lease on a spilled job; None if it expired and was taken over."""
+        now = datetime.utcnow()
+        try:
+            result = db.job_spill.update_one({"_id": job_id, "claimedAt": claimed_at}, {"$set": {"claimedAt": now}})
+        except PyMongoError:
+            logger.exception("Could not renew the lease of spilled job %s", job_id)
+            return None  # the record keeps its lease and is retried once it expires
+        return now if result.matched_count else None
+
+    def _spill(self, job, error: str = None):
+        name, args, kwargs, attempts, job_id, claimed_at = job
+        try:
+            if claimed_at is not None:
+                # Already in job_spill under our lease: record the outcome and release it
+                db.job_spill.update_one(
+                    {"_id": job_id},
+                    {"$set": {"attempts": attempts, "failed": error is not None, "error": error, "claimedAt": None}},
+                )
+                return
+            db.job_spill.insert_one(
+                {
+                    "_id": job_id,
+                    "name": name,
+                    "args": list(args),
+                    "kwargs": kwargs,
+                    "attempts": attempts,
+                    "failed": error is not None,
+                    "error": error,
+                    "claimedAt": None,
+                    "createdAt": datetime.utcnow(),
+                }
+            )
+            self.stats["spilled"] += 1
+        except PyMongoError:
+            logger.exception("Could not spill job %s", name)
+
+    def _reclaim_spilled(self, limit: int = 100):
+        try:
+            for _ in range(limit):
+                if self._queue.full():
+                    return
+                now = datetime.utcnow()
+                doc = db.job_spill.find_one_and_update(
+                    {
+                        "failed": False,
+                        "$or": [
+                            {"claimedAt": None},
+                            {"claimedAt": {"$lt": now - timedelta(seconds=self.lease_timeout)}},
+                        ],
+                    },
+                    {"$set": {"claimedAt": now}},
+                    sort=[("createdAt", 1)],
+                )
+                if doc is None:
+                    return
+                self._queue.put_nowait((doc["name"], tuple(doc["args"]), doc["kwargs"], doc["attempts"], doc["_id"], now))
+        except (PyMongoError, queue.Full):
+            logger.exception("Could not reclaim spilled jobs")
+
+    def _release(self, job_id):
+        try:
+            db.job_spill.delete_one({"_id": job_id})
+        except PyMongoError:
+            logger.exception("Could not release spilled job %s", job_id)
+
+
+job_queue = JobQueue(mode="inline")
+
+
+def init_jobs(app):
+    global job_queue
+    job_queue = JobQueue(
+        mode=app.config["JOBS_MODE"],
+        workers=app.config["JOBS_WORKERS"],
+        max_size=app.config["JOBS_QUEUE_SIZE"],
+        max_retries=app.config["JOBS_MAX_RETRIES"],
+    )
+    job_queue.start()
+
+
+def enqueue(name: str, *args, **kwargs):
+    job_queue.enqueue(name, *args, **kwargs)
+
+
+def current_job_id():
+    """Id of the job running on this thread (stable across retries and replays), or None."""
+    return getattr(_local, "job_id", None)
@@ -0,0 +1,108 @@
+import logging
+from datetime import datetime
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo import ReturnDocument
+
+from .. import db
+
+
+logger = logging.getLogger(__name__)
+
+ISSUE_STATES = ["REPORTED", "VERIFIED", "ASSIGNED", "IN_PROGRESS", "RESOLVED", "CLOSED"]
+
+# Target state -> states an issue may enter it from. Re-assigning an issue
+# that is already being worked on is allowed; closing requires a resolution.
+ALLOWED_TRANSITIONS = {
+    "REPORTED": [],
+    "VERIFIED": ["REPORTED"],
+    "ASSIGNED": ["REPORTED", "VERIFIED", "ASSIGNED", "IN_PROGRESS"],
+    "IN_PROGRESS": ["ASSIGNED", "IN_PROGRESS"],
+    "RESOLVED": ["ASSIGNED", "IN_PROGRESS"],
+    "CLOSED": ["RESOLVED"],
+}
+
+
+# Event -> in-process listeners, run after the write succeeded:
+#   created(issue), transitioned(before, after), deleted(issue)
+# Listeners keep derived in-memory state current; a failing listener is
+# logged and never fails the request.
+_listeners = {"created": [], "transitioned": [], "deleted": []}
+
+
+def add_listener(event: str, fn):
+    _listeners[event].append(fn)
+    return fn
+
+
+def _emit(event: str, *args):
+    for fn in _listeners[event]:
+        try:
+            fn(*args)
+        except Exception:
+            logger.exception("Issue %s listener %s failed", event, getattr(fn, "__name__", fn))
+
+
+def issue_created(issue: dict):
+    """Announce a newly inserted issue to the listeners."""
+    _emit("created", issue)
+
+
+def issue_deleted(issue: dict):
+    """Announce a deleted issue (the removed document) to the listeners."""
+    _emit("deleted", issue)
+
+
+class TransitionError(Exception):
+    """A lifecycle transition that was refused, with the HTTP status to answer."""
+
+    def __init__(self, message: str, status_code: int = 400):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def parse_issue_id(issue_id) -> ObjectId:
+    try:
+        return issue_id if isinstance(issue_id, ObjectId) else ObjectId(issue_id)
+    except (InvalidId, TypeError):
+        raise TransitionError("Invalid issue id")
+
+
+def transition_issue(issue_id, new_status: str, set_fields: dict = None, match: dict = None, from_states: list = None) -> dict:
+    """Move an issue to `new_status` and return the updated document.
+
+    The state check and the write happen in a single conditional
+    ``find_one_and_update``, so two concurrent transitions can never both
+    succeed. `match` adds conditions (e.g. ``assignedTo``), `from_states`
+    narrows ALLOWED_TRANSITIONS further and `set_fields` are written along
+    with the new status. A refused transition costs one extra read to tell
+    "not found" apart from "wrong state".
+    """
+    if new_status not in ALLOWED_TRANSITIONS:
+        raise TransitionError(f"Unknown status {new_status}")
+    oid = parse_issue_id(issue_id)
+    allowed = ALLOWED_TRANSITIONS[new_status]
+    if from_states is not None:
+        allowed = [s for s in allowed if s in from_states]
+
+    now = datetime.utcnow()
+    update = {**(set_fields or {}), "status": new_status, "updatedAt": now}
+    if new_status == "CLOSED":
+        update["closedAt"] = now
+    criteria = {"_id": oid, **(match or {})}
+    before = db.issues.find_one_and_update(
+        {**criteria, "status": {"$in": allowed}},
+        {"$set": update},
+        return_document=ReturnDocument.BEFORE,
+    )
+    if before is None:
+        current = db.issues.find_one(criteria, {"status": 1})
+        if current is None:
+            raise TransitionError("Issue not found", 404)
+        raise TransitionError(f"Issue cannot move from {current.get('status')} to {new_status}")
+
+    # The pre-image plus our $set is exactly the stored post-image
+    after = {**before, **update}
+    _emit("transitioned", before, after)
+    return after
@@ -0,0 +1,210 @@
+import math
+from datetime import datetime
+
+from bson import ObjectId
+from pymongo import UpdateOne
+
+from .. import db
+from .jobs import enqueue, register_job
+from .lifecycle import add_listener
+from .versions import bump_version
+
+
+# Map zoom z is served from grid level z + CELLS_PER_TILE_SHIFT, i.e. each
+# web-mercator tile is split into 8 x 8 cells (about 32 px on screen).
+CELLS_PER_TILE_SHIFT = 3
+MIN_LEVEL = CELLS_PER_TILE_SHIFT
+MAX_LEVEL = 18
+MAX_LATITUDE = 85.05112878
+
+
+def cell(lat: float, lng: float, level: int):
+    """Web-mercator (x, y) of the grid cell containing (lat, lng) at `level`."""
+    n = 2 ** level
+    lat = max(-MAX_LATITUDE, min(MAX_LATITUDE, lat))
+    x = int((lng + 180.0) / 360.0 * n)
+    y = int((1.0 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2.0 * n)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+
+def group_key(status: str, category: str) -> str:
+    """Per-cell counter key for a status/category pair ("." and "$" are not allowed in field names)."""
+    return f"{status}|{category}".replace(".", "_").replace("$", "_")
+
+
+def _location(issue: dict):
+    location = issue.get("location") or {}
+    try:
+        return float(location["lat"]), float(location["lng"])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def _increments(issue: dict, sign: int):
+    """One $inc per level adding (sign=1) or removing (sign=-1) `issue`."""
+    point = _location(issue)
+    if point is None:
+        return []
+    lat, lng = point
+    key = group_key(issue.get("status"), issue.get("category"))
+    operations = []
+    for level in range(MIN_LEVEL, MAX_LEVEL + 1):
+        x, y = cell(lat, lng, level)
+        operations.append(
+            UpdateOne(
+                {"_id": f"{level}:{x}:{y}"},
+                {
+                    "$inc": {
+                        f"groups.{key}.n": sign,
+                        f"groups.{key}.lat": sign * lat,
+                        f"groups.{key}.lng": sign * lng,
+                    },
+                    "$setOnInsert": {"level": level, "x": x, "y": y, "createdAt": datetime.utcnow()},
+                },
+                upsert=True,
+            )
+        )
+    return operations
+
+
+def _grid_fields(issue: dict) -> dict:
+    return {"location": issue.get("location"), "status": issue.get("status"), "category": issue.get("category")}
+
+
+def apply_changes(changes: list):
+    """Job: add (sign=1) or remove (sign=-1) each issue of `changes`, a list of [issue, sign] pairs.
+
+    Every write is an $inc, so jobs applied in any order end in the same counts.
+    """
+    operations = [op for issue, sign in changes for op in _increments(issue, sign)]
+    if operations:
+        db.map_grid.bulk_write(operations, ordered=False)
+
+
+register_job("map_grid", apply_changes)
+
+
+# The 16 per-level writes run on the job queue, off the request path
+def add_issue(issue: dict):
+    enqueue("map_grid", [[_grid_fields(issue), 1]])
+
+
+def remove_issue(issue: dict):
+    enqueue("map_grid", [[_grid_fields(issue), -1]])
+
+
+def move_issue(before: dict, after: dict):
+    """Move an issue between groups when its status or category changes."""
+    if before.get("status") == after.get("status") and before.get("category") == after.get("category"):
+        return
+    enqueue("map_grid", [[_grid_fields(before), -1], [_grid_fields(after), 1]])
+
+
+add_listener("created", add_issue)
+add_listener("transitioned", move_issue)
+add_listener("deleted", remove_issue)
+
+
+def clusters(bbox: tuple, zoom: int, status: str = None, category: str = None) -> list:
+    """Cluster centroids with counts for the cells of `bbox` at map `zoom`.
+
+    `bbox` is (min_lng, min_lat, max_lng, max_lat). The cost depends on the
+    number of cells on screen, never on the number of issues.
+    """
+    level = max(MIN_LEVEL, min(MAX_LEVEL, zoom + CELLS_PER_TILE_SHIFT))
+    min_lng, min_lat, max_lng, max_lat = bbox
+    x_min, y_min = cell(max_lat, min_lng, level)
+    x_max, y_max = cell(min_lat, max_lng, level)
+    query = {"level": level, "x": {"$gte": x_min, "$lte": x_max}, "y": {"$gte": y_min, "$lte": y_max}}
+
+    wanted = group_key(status or "", category or "")
+    wanted_status, _, wanted_category = wanted.partition("|")
+    results = []
+    for doc in db.map_grid.find(query, {"groups": 1}):
+        n = lat = lng = 0
+        for key, counter in doc.get("groups", {}).items():
+            key_status, _, key_category = key.partition("|")
+            if (status and key_status != wanted_status) or (category and key_category != wanted_category):
+                continue
+            n += counter.get("n", 0)
+            lat += counter.get("lat", 0)
+            lng += counter.get("lng", 0)
+        if n > 0:
+            results.append({"lat": round(lat / n, 6), "lng": round(lng / n, 6), "count": n})
+    return results
+
+
+def _level_pipeline(level: int, run_id: ObjectId) -> list:
+    """Aggregation writing every cell of `level`, computed like `cell` and `group_key`, into map_grid."""
+    n = 2 ** level
+    lat = {"$max": [-MAX_LATITUDE, {"$min": [MAX_LATITUDE, "$lat"]}]}
+    x = {"$trunc": {"$multiply": [{"$divide": [{"$add": ["$lng", 180.0]}, 360.0]}, n]}}
+    y = {
+        "$trunc": {
+            "$multiply": [
+                {"$divide": [{"$subtract": [1.0, {"$divide": [{"$asinh": {"$tan": {"$degreesToRadians": lat}}}, math.pi]}]}, 2.0]},
+                n,
+            ]
+        }
+    }
+    key = {"$concat": [{"$toString": {"$ifNull": ["$status", "None"]}}, "|", {"$toString": {"$ifNull": ["$category", "None"]}}]}
+    for char in (".", "$"):
+        key = {"$replaceAll": {"input": key, "find": {"$literal": char}, "replacement": "_"}}
+
+    def clamp(value):
+        return {"$toInt": {"$min": [{"$max": [value, 0]}, n - 1]}}
+
+    def number(field):
+        return {"$convert": {"input": field, "to": "double", "onError": None, "onNull": None}}
+
+    return [
+        {"$project": {"status": 1, "category": 1, "lat": number("$location.lat"), "lng": number("$location.lng")}},
+        {"$match": {"lat": {"$ne": None}, "lng": {"$ne": None}}},
+        {
+            "$group": {
+                "_id": {"x": clamp(x), "y": clamp(y), "key": key},
+                "n": {"$sum": 1},
+                "lat": {"$sum": "$lat"},
+                "lng": {"$sum": "$lng"},
+            }
+        },
+        {
+            "$group": {
+                "_id": {"x": "$_id.x", "y": "$_id.y"},
+                "groups": {"$push": {"k": "$_id.key", "v": {"n": "$n", "lat": "$lat", "lng": "$lng"}}},
+            }
+        },
+        {
+            "$project": {
+                "_id": {"$concat": [f"{level}:", {"$toString": "$_id.x"}, ":", {"$toString": "$_id.y"}]},
+                "level": {"$literal": level},
+                "x": "$_id.x",
+                "y": "$_id.y",
+                "groups": {"$arrayToObject": "$groups"},
+                "rebuildId": {"$literal": run_id},
+            }
+        },
+        {"$merge": {"into": "map_grid", "on": "_id", "whenMatched": "replace", "whenNotMatched": "insert"}},
+    ]
+
+
+def rebuild_map_grid() -> int:
+    """Recompute map_grid from the issues collection; returns the number of cells.
+
+    Each level is grouped inside MongoDB and merged over the existing cells,
+    so memory stays on the server and readers never see an empty grid.
+    Cells that no rebuilt level produced are deleted afterwards, except
+    cells the listeners created while the rebuild ran. The ``issues``
+    version is bumped at the end so cached map responses are revalidated.
+    """
+    run_id, started = ObjectId(), datetime.utcnow()
+    for level in range(MIN_LEVEL, MAX_LEVEL + 1):
+        db.issues.aggregate(_level_pipeline(level, run_id), allowDiskUse=True).close()
+    db.map_grid.delete_many(
+        {
+            "rebuildId": {"$ne": run_id},
+            "$or": [{"createdAt": {"$exists": False}}, {"createdAt": {"$lt": started}}],
+        }
+    )
+    bump_version("issues")
+    return db.map_grid.count_documents({"rebuildId": run_id})
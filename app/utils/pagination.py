@@ -0,0 +1,105 @@
+import base64
+import json
+from datetime import datetime
+from urllib.parse import urlencode
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from flask import jsonify, request
+
+
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 500
+
+
+class CursorError(ValueError):
+    """Raised for a malformed `cursor` or `limit` query parameter."""
+
+
+def encode_cursor(value, oid: ObjectId) -> str:
+    if isinstance(value, datetime):
+        value = {"$date": value.isoformat()}
+    raw = json.dumps({"v": value, "id": str(oid)}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        value = data["v"]
+        if isinstance(value, dict):
+            value = datetime.fromisoformat(value["$date"])
+        return value, ObjectId(data["id"])
+    except (ValueError, KeyError, TypeError, InvalidId) as exc:
+        raise CursorError("Invalid cursor") from exc
+
+
+def parse_limit(raw, default: int = DEFAULT_LIMIT, maximum: int = MAX_LIMIT) -> int:
+    if raw in (None, ""):
+        return default
+    try:
+        limit = int(raw)
+    except (TypeError, ValueError) as exc:
+        raise CursorError("Invalid limit") from exc
+    return max(1, min(limit, maximum))
+
+
+def after_cursor(query: dict, sort_field: str, cursor: str = None) -> dict:
+    """Narrow `query` to rows strictly after `cursor` in newest-first order."""
+    if not cursor:
+        return query
+    value, oid = decode_cursor(cursor)
+    keyset = {
+        "$or": [
+            {sort_field: {"$lt": value}},
+            {sort_field: value, "_id": {"$lt": oid}},
+        ]
+    }
+    return {"$and": [query, keyset]} if query else keyset
+
+
+def paginate(collection, query: dict, sort_field: str, projection: dict = None, limit: int = DEFAULT_LIMIT, cursor: str = None):
+    """Fetch one newest-first keyset page ordered by (sort_field, _id).
+
+    Returns ``(docs, next_cursor)``; ``next_cursor`` is None on the last page.
+    The cost of a page depends only on `limit`, never on how deep it is.
+    """
+    docs = list(
+        collection.find(after_cursor(query, sort_field, cursor), projection)
+        .sort([(sort_field, -1), ("_id", -1)])
+        .limit(limit + 1)
+    )
+    next_cursor = None
+    if len(docs) > limit:
+        docs = docs[:limit]
+        last = docs[-1]
+        next_cursor = encode_cursor(last.get(sort_field), last["_id"])
+    return docs, next_cursor
+
+
+def paginate_request(collection, query: dict, sort_field: str, projection: dict = None):
+    """`paginate` driven by the request's `cursor` and `limit` arguments (default DEFAULT_LIMIT)."""
+    return paginate(
+        collection,
+        query,
+        sort_field,
+        projection,
+        limit=parse_limit(request.args.get("limit")),
+        cursor=request.args.get("cursor"),
+    )
+
+
+def page_response(body, next_cursor: str = None):
+    """JSON body with the next page advertised in headers.
+
+    List bodies stay plain lists so existing clients keep working; callers
+    that page follow ``X-Next-Cursor`` (or the ``Link: rel="next"`` URL).
+    """
+    response = jsonify(body)
+    if next_cursor:
+        args = request.args.to_dict()
+        args["cursor"] = next_cursor
+        response.headers["X-Next-Cursor"] = next_cursor
+        response.headers["Link"] = f'<{request.path}?{urlencode(args)}>; rel="next"'
+    return response
@@ -0,0 +1,46 @@
+import os
+from functools import wraps
+
+from flask import Response, make_response, request
+
+from .cache import ResultCache
+from .lifecycle import add_listener
+
+
+# Responses of the public read-only endpoints, tagged with the collections
+# they are computed from ("issues", "users", "impact"). Writes invalidate
+# the tags in their own process; RESULT_CACHE_TTL bounds how long another
+# worker can serve a stale result.
+result_cache = ResultCache(
+    maxsize=int(os.getenv("RESULT_CACHE_SIZE", 256)),
+    ttl=float(os.getenv("RESULT_CACHE_TTL", 30)),
+)
+
+
+def invalidate_results(*tags):
+    """Call after a write to the data behind `tags`."""
+    result_cache.invalidate_tags(*tags)
+
+
+add_listener("created", lambda issue: invalidate_results("issues"))
+add_listener("transitioned", lambda before, after: invalidate_results("issues"))
+add_listener("deleted", lambda issue: invalidate_results("issues"))
+
+
+def cached_result(*tags):
+    """Serve a view's response body from result_cache, keyed by endpoint and query string."""
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            def compute():
+                response = make_response(fn(*args, **kwargs))
+                return response.status_code, response.get_data(), response.mimetype
+
+            status, body, mimetype = result_cache.get_or_compute(
+                (request.endpoint, request.query_string), compute, tags
+            )
+            return Response(body, status=status, mimetype=mimetype)
+
+        return wrapper
+
+    return decorator
@@ -1,13 +1,6 @@
-SDG_MAPPING = {
-    "Water Leakage": {"sdgTags": [6], "impactType": "water"},
-    "Garbage Dump": {"sdgTags": [11, 13], "impactType": "waste"},
-    "Broken Streetlight": {"sdgTags": [5, 11], "impactType": "safety"},
-    "Pothole": {"sdgTags": [11], "impactType": "emission"},
-    "Traffic Signal Failure": {"sdgTags": [13], "impactType": "fuel"},
-}
+from .impact_models import get_impact_model
 
 
 def map_category_to_sdg(category: str):
-    return SDG_MAPPING.get(category, {"sdgTags": [], "impactType": None})
-
-
+    # SDG tags come from the active impact model (see impact_models.DEFAULT_MODEL)
+    return get_impact_model().sdg_for(category)
@@ -1,33 +1,230 @@
 import datetime
 import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from contextlib import contextmanager
 
 import bcrypt
 import jwt
 
+from .cache import TTLCache
 
-def hash_password(password: str) -> bytes:
-    return bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt())
+try:
+    import fcntl
+except ImportError:  # Windows: hashing is only bounded per process
+    fcntl = None
 
 
-def verify_password(password: str, hashed: bytes) -> bool:
+# Loaded once by init_security(); scripts that never build the app fall
+# back to the environment.
+_jwt_secret = None
+
+# Already-verified access tokens, each kept no longer than its own `exp`.
+_token_cache = TTLCache(maxsize=4096, ttl=300)
+
+# bcrypt runs on a small dedicated pool (it releases the GIL) so a login
+# burst can only occupy `workers` cores; requests beyond `queue_depth`
+# waiting hashes are rejected with HashingBusyError instead of piling up.
+# The pool is per process, so every hash also holds one of `host_slots`
+# locks shared by all worker processes on the machine; when none frees up
+# within `host_wait` seconds the request fails fast rather than holding its
+# (sync) worker while other workers hash.
+_hashing = {
+    "rounds": int(os.getenv("BCRYPT_ROUNDS", 12)),
+    "workers": int(os.getenv("BCRYPT_WORKERS", 2)),
+    "queue_depth": int(os.getenv("BCRYPT_QUEUE_DEPTH", 8)),
+    "timeout": float(os.getenv("BCRYPT_TIMEOUT", 10)),
+    "host_slots": int(os.getenv("BCRYPT_HOST_SLOTS", 2)),
+    "host_wait": float(os.getenv("BCRYPT_HOST_WAIT", 1)),
+    "lock_dir": os.getenv("BCRYPT_LOCK_DIR") or os.path.join(tempfile.gettempdir(), "urban-pulse-bcrypt"),
+}
+_hash_executor = None
+_hash_slots = None
+_host_slots = None
+_hash_lock = threading.Lock()
+
+
+class HashingBusyError(Exception):
+    """Raised when the password hashing queue is full or too slow."""
+
+
+def init_security(app):
+    global _jwt_secret
+    _jwt_secret = app.config["JWT_SECRET"]
+    _token_cache.maxsize = app.config["TOKEN_CACHE_SIZE"]
+    _token_cache.ttl = app.config["TOKEN_CACHE_TTL"]
+    _token_cache.clear()
+    _configure_hashing(
+        rounds=app.config["BCRYPT_ROUNDS"],
+        workers=app.config["BCRYPT_WORKERS"],
+        queue_depth=app.config["BCRYPT_QUEUE_DEPTH"],
+        timeout=app.config["BCRYPT_TIMEOUT"],
+        host_slots=app.config["BCRYPT_HOST_SLOTS"],
+        host_wait=app.config["BCRYPT_HOST_WAIT"],
+        lock_dir=app.config["BCRYPT_LOCK_DIR"],
+    )
+
+
+def get_jwt_secret() -> str:
+    return _jwt_secret or os.getenv("JWT_SECRET", "jwt-secret")
+
+
+class HostSlots:
+    """At most `count` holders at a time across every process on this host.
+
+    Each slot is an exclusive flock on its own file, so a worker that dies
+    mid-hash gives its slot back when the kernel closes its descriptor.
+    """
+
+    def __init__(self, directory: str, count: int):
+        os.makedirs(directory, exist_ok=True)
+        self.paths = [os.path.join(directory, f"slot-{i}.lock") for i in range(count)]
+
+    def _try_acquire(self):
+        for path in self.paths:
+            fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return fd
+            except BlockingIOError:
+                os.close(fd)
+        return None
+
+    @contextmanager
+    def hold(self, wait: float):
+        deadline = time.monotonic() + wait
+        fd = self._try_acquire()
+        while fd is None:
+            if time.monotonic() >= deadline:
+                raise HashingBusyError("Password hashing is busy in every worker")
+            time.sleep(0.01)
+            fd = self._try_acquire()
+        try:
+            yield
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+
+
+def _configure_hashing(**options):
+    global _hash_executor, _hash_slots, _host_slots
+    with _hash_lock:
+        _hashing.update(options)
+        if _hash_executor is not None:
+            _hash_executor.shutdown(wait=False)
+        _hash_executor = None
+        _hash_slots = None
+        _host_slots = None
+
+
+def _get_hash_executor():
+    global _hash_executor, _hash_slots, _host_slots
+    with _hash_lock:
+        if _hash_executor is None:
+            _hash_executor = ThreadPoolExecutor(
+                max_workers=_hashing["workers"], thread_name_prefix="bcrypt"
+            )
+            _hash_slots = threading.BoundedSemaphore(_hashing["workers"] + _hashing["queue_depth"])
+            if fcntl is not None and _hashing["host_slots"] > 0:
+                _host_slots = HostSlots(_hashing["lock_dir"], _hashing["host_slots"])
+        return _hash_executor, _hash_slots, _host_slots
+
+
+def _run_hashing(host_slots, fn, *args):
+    if host_slots is None:
+        return fn(*args)
+    with host_slots.hold(_hashing["host_wait"]):
+        return fn(*args)
+
+
+def submit_hashing(fn, *args):
+    """Queue `fn` on the hashing pool, raising HashingBusyError when full.
+
+    The future raises HashingBusyError too when no host-wide slot frees up
+    in time.
+    """
+    executor, slots, host_slots = _get_hash_executor()
+    if not slots.acquire(blocking=False):
+        raise HashingBusyError("Password hashing queue is full")
+    try:
+        future = executor.submit(_run_hashing, host_slots, fn, *args)
+    except Exception:
+        slots.release()
+        raise
+    future.add_done_callback(lambda _: slots.release())
+    return future
+
+
+def _wait(future):
+    try:
+        return future.result(timeout=_hashing["timeout"])
+    except FutureTimeoutError:
+        raise HashingBusyError("Password hashing timed out")
+
+
+def _hashpw(password: str) -> bytes:
+    return bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt(rounds=_hashing["rounds"]))
+
+
+def _checkpw(password: str, hashed: bytes) -> bool:
     try:
         return bcrypt.checkpw(password.encode("utf-8"), hashed)
     except ValueError:
         return False
 
 
+def hash_password(password: str) -> bytes:
+    return _wait(submit_hashing(_hashpw, password))
+
+
+def verify_password(password: str, hashed: bytes) -> bool:
+    return _wait(submit_hashing(_checkpw, password, hashed))
+
+
+def needs_rehash(hashed: bytes) -> bool:
+    """True when a stored hash was made with a different work factor."""
+    try:
+        return int(hashed.split(b"$")[2]) != _hashing["rounds"]
+    except (AttributeError, IndexError, ValueError):
+        return False
+
+
+def rehash_password_async(password: str, on_done):
+    """Hash `password` at the current cost off-thread and hand it to `on_done`.
+
+    Best effort: when the pool is saturated the upgrade is skipped and
+    simply retried on the user's next login.
+    """
+    def task():
+        on_done(_hashpw(password))
+
+    try:
+        submit_hashing(task)
+    except HashingBusyError:
+        pass
+
+
 def create_access_token(user_id: str, role: str, expires_minutes: int = 60) -> str:
     payload = {
         "sub": user_id,
         "role": role,
         "exp": datetime.datetime.utcnow() + datetime.timedelta(minutes=expires_minutes),
     }
-    secret = os.getenv("JWT_SECRET", "jwt-secret")
-    return jwt.encode(payload, secret, algorithm="HS256")
+    return jwt.encode(payload, get_jwt_secret(), algorithm="HS256")
 
 
 def decode_token(token: str):
-    secret = os.getenv("JWT_SECRET", "jwt-secret")
-    return jwt.decode(token, secret, algorithms=["HS256"])
+    payload = _token_cache.get(token)
+    if payload is None:
+        payload = jwt.decode(token, get_jwt_secret(), algorithms=["HS256"])
+        ttl = _token_cache.ttl
+        if "exp" in payload:
+            ttl = min(ttl, payload["exp"] - time.time())
+        _token_cache.set(token, payload, ttl=ttl)
+    return dict(payload)
 
 
+def token_cache_stats() -> dict:
+    return _token_cache.stats()
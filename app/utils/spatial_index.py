@@ -0,0 +1,213 @@
+import atexit
+import logging
+import math
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+from pymongo.errors import PyMongoError
+
+from .. import db
+from .geo import EARTH_RADIUS_M, haversine_m
+from .lifecycle import add_listener
+
+
+logger = logging.getLogger(__name__)
+
+OPEN_STATES = ["REPORTED", "VERIFIED", "ASSIGNED", "IN_PROGRESS", "RESOLVED"]
+
+# Re-read this much before the last sync to absorb clock skew between app hosts
+SYNC_OVERLAP = timedelta(seconds=5)
+
+INDEX_FIELDS = {"title": 1, "category": 1, "status": 1, "location": 1, "imageUrl": 1, "createdAt": 1, "updatedAt": 1}
+
+
+class SpatialIndex:
+    """Grid-bucket index of open issues held in process memory.
+
+    Issues are bucketed into `cell_deg` x `cell_deg` cells; a radius query
+    scans only the cells overlapping its bounding box and computes exact
+    haversine distances. The index is built from a projected cursor,
+    updated in-process through the lifecycle listeners, and re-synced
+    from Mongo on a background thread: changes since the last sync every
+    `refresh_interval` seconds, a full rebuild (which also drops issues
+    deleted by other processes) every `rebuild_interval` seconds.
+    """
+
+    def __init__(self, cell_deg: float = 0.01, refresh_interval: float = 30, rebuild_interval: float = 600):
+        self.cell_deg = cell_deg
+        self.refresh_interval = refresh_interval
+        self.rebuild_interval = rebuild_interval
+        self.ready = False
+        self._cells = {}
+        self._entries = {}
+        self._lock = threading.RLock()
+        self._stopping = threading.Event()
+        self._thread = None
+        self._synced_at = None
+        self._built_at = None
+        self._built_monotonic = None
+        self._build_seconds = None
+
+    # -- maintenance ---------------------------------------------------
+
+    def start(self):
+        if self._thread is None and self.refresh_interval > 0:
+            self._thread = threading.Thread(target=self._run, name="spatial-index", daemon=True)
+            self._thread.start()
+            atexit.register(self._stopping.set)
+        self.rebuild()
+
+    def rebuild(self):
+        started = time.monotonic()
+        synced_at = datetime.utcnow()
+        cells, entries = {}, {}
+        query = {"status": {"$in": OPEN_STATES}}
+        for issue in db.issues.find(query, INDEX_FIELDS).batch_size(5000):
+            self._place(cells, entries, issue)
+        with self._lock:
+            self._cells, self._entries = cells, entries
+            self._synced_at = synced_at
+            self._built_at = synced_at
+            self._built_monotonic = started
+            self._build_seconds = round(time.monotonic() - started, 3)
+            self.ready = True
+
+    def sync(self):
+        """Apply issues created or updated (by any process) since the last sync."""
+        synced_at = datetime.utcnow()
+        for issue in db.issues.find({"updatedAt": {"$gte": self._synced_at - SYNC_OVERLAP}}, INDEX_FIELDS):
+            self.update(issue)
+        self._synced_at = synced_at
+
+    def update(self, issue: dict):
+        with self._lock:
+            self._remove(issue["_id"])
+            if issue.get("status") in OPEN_STATES:
+                self._place(self._cells, self._entries, issue)
+
+    def remove(self, issue_id: ObjectId):
+        with self._lock:
+            self._remove(issue_id)
+
+    def _run(self):
+        while not self._stopping.wait(self.refresh_interval):
+            try:
+                if not self.ready or time.monotonic() - self._built_monotonic >= self.rebuild_interval:
+                    self.rebuild()
+                else:
+                    self.sync()
+            except PyMongoError:
+                logger.exception("Spatial index refresh failed")
+
+    def _cell(self, lat: float, lng: float):
+        return (math.floor(lat / self.cell_deg), math.floor(lng / self.cell_deg))
+
+    def _place(self, cells: dict, entries: dict, issue: dict):
+        location = issue.get("location") or {}
+        try:
+            lat, lng = float(location["lat"]), float(location["lng"])
+        except (KeyError, TypeError, ValueError):
+            return
+        cell = self._cell(lat, lng)
+        entry = {**issue, "lat": lat, "lng": lng, "cell": cell}
+        entries[issue["_id"]] = entry
+        cells.setdefault(cell, {})[issue["_id"]] = entry
+
+    def _remove(self, issue_id: ObjectId):
+        entry = self._entries.pop(issue_id, None)
+        if entry is None:
+            return
+        bucket = self._cells.get(entry["cell"])
+        if bucket is not None:
+            bucket.pop(issue_id, None)
+            if not bucket:
+                del self._cells[entry["cell"]]
+
+    # -- queries -------------------------------------------------------
+
+    def covers(self, statuses) -> bool:
+        """Whether a query restricted to `statuses` can be answered here."""
+        return self.ready and bool(statuses) and all(s in OPEN_STATES for s in statuses)
+
+    def nearby(self, lat: float, lng: float, radius_m: float, statuses, category: str = None, after=None) -> list:
+        """Issues within `radius_m`, as (distance_m, entry) sorted by (distance, _id).
+
+        `after` is the (distance, _id) of the previous page's last row.
+        """
+        dlat = math.degrees(radius_m / EARTH_RADIUS_M)
+        cos_lat = max(math.cos(math.radians(lat)), 1e-6)
+        dlng = min(180.0, dlat / cos_lat)
+        lat_lo, lng_lo = self._cell(lat - dlat, lng - dlng)
+        lat_hi, lng_hi = self._cell(lat + dlat, lng + dlng)
+
+        results = []
+        with self._lock:
+            if (lat_hi - lat_lo + 1) * (lng_hi - lng_lo + 1) <= len(self._cells):
+                keys = ((i, j) for i in range(lat_lo, lat_hi + 1) for j in range(lng_lo, lng_hi + 1))
+            else:
+                # Wide radius: cheaper to filter the populated cells
+                keys = [k for k in self._cells if lat_lo <= k[0] <= lat_hi and lng_lo <= k[1] <= lng_hi]
+            for key in keys:
+                for entry in self._cells.get(key, {}).values():
+                    if entry["status"] not in statuses or (category and entry.get("category") != category):
+                        continue
+                    distance = haversine_m(lat, lng, entry["lat"], entry["lng"])
+                    if distance <= radius_m:
+                        results.append((distance, entry))
+        results.sort(key=lambda row: (row[0], row[1]["_id"]))
+        if after is not None:
+            results = [row for row in results if (row[0], row[1]["_id"]) > after]
+        return results
+
+    def stats(self) -> dict:
+        with self._lock:
+            approx_bytes = sys.getsizeof(self._entries) + sys.getsizeof(self._cells)
+            for entry in self._entries.values():
+                approx_bytes += sys.getsizeof(entry) + sum(sys.getsizeof(v) for v in entry.values())
+            for bucket in self._cells.values():
+                approx_bytes += sys.getsizeof(bucket)
+            return {
+                "enabled": True,
+                "ready": self.ready,
+                "issues": len(self._entries),
+                "cells": len(self._cells),
+                "cellDeg": self.cell_deg,
+                "approxBytes": approx_bytes,
+                "buildSeconds": self._build_seconds,
+                "builtAt": self._built_at.isoformat() if self._built_at else None,
+                "syncedAt": self._synced_at.isoformat() if self._synced_at else None,
+            }
+
+
+# None until init_spatial_index() builds one (SPATIAL_INDEX_ENABLED)
+spatial_index = None
+
+
+def init_spatial_index(app):
+    global spatial_index
+    if not app.config["SPATIAL_INDEX_ENABLED"]:
+        return
+    spatial_index = SpatialIndex(
+        cell_deg=app.config["SPATIAL_INDEX_CELL_DEG"],
+        refresh_interval=app.config["SPATIAL_INDEX_REFRESH"],
+        rebuild_interval=app.config["SPATIAL_INDEX_REBUILD"],
+    )
+    add_listener("created", spatial_index.update)
+    add_listener("transitioned", lambda before, after: spatial_index.update(after))
+    add_listener("deleted", lambda issue: spatial_index.remove(issue["_id"]))
+    try:
+        spatial_index.start()
+    except PyMongoError:
+        # Queries fall back to Mongo until the background refresh succeeds
+        logger.exception("Could not build the spatial index at startup")
+
+
+def get_spatial_index():
+    return spatial_index
+
+
+def spatial_index_stats() -> dict:
+    return spatial_index.stats() if spatial_index else {"enabled": False}
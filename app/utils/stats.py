@@ -0,0 +1,95 @@
+from datetime import datetime, timedelta
+
+from .. import db
+from .lifecycle import ISSUE_STATES
+
+
+RESOLVED_STATES = ["RESOLVED", "CLOSED"]
+
+RECENT_FIELDS = {"title": 1, "category": 1, "status": 1, "location": 1, "createdAt": 1}
+RECENT_LIMIT = 10
+
+
+def _top_reporters(limit: int) -> list:
+    return [
+        {"$group": {"_id": "$reportedBy", "count": {"$sum": 1}}},
+        {"$sort": {"count": -1}},
+        {"$limit": limit},
+        {"$lookup": {"from": "users", "localField": "_id", "foreignField": "_id", "as": "user"}},
+        {"$unwind": "$user"},  # drops reporters whose account is gone
+        {"$project": {"count": 1, "name": "$user.name", "points": "$user.points"}},
+    ]
+
+
+def _time_windows(now: datetime) -> list:
+    today_start = datetime(now.year, now.month, now.day)
+    week_start = now - timedelta(days=7)
+    month_start = now - timedelta(days=30)
+
+    def since(start):
+        return {"$sum": {"$cond": [{"$gte": ["$createdAt", start]}, 1, 0]}}
+
+    return [
+        {"$match": {"createdAt": {"$gte": min(today_start, month_start)}}},
+        {"$group": {"_id": None, "today": since(today_start), "week": since(week_start), "month": since(month_start)}},
+    ]
+
+
+# Facet name -> builder of its sub-pipeline
+FACETS = {
+    "statuses": lambda now, limit: [{"$group": {"_id": "$status", "count": {"$sum": 1}}}],
+    "categories": lambda now, limit: [{"$group": {"_id": "$category", "count": {"$sum": 1}}}, {"$sort": {"count": -1}}],
+    "windows": lambda now, limit: _time_windows(now),
+    "resolution": lambda now, limit: [
+        {"$match": {"status": {"$in": RESOLVED_STATES}}},
+        {"$group": {"_id": None, "avgTime": {"$avg": {"$subtract": ["$updatedAt", "$createdAt"]}}}},
+    ],
+    "topReporters": lambda now, limit: _top_reporters(limit),
+}
+
+
+def issue_stats(facets: list, top_limit: int = 5) -> dict:
+    """Dashboard statistics over ``issues`` in a single $facet aggregation.
+
+    `facets` picks the sections to compute (keys of FACETS, or "recent");
+    the total and resolved counts are derived from the status breakdown,
+    which is always included. One round trip and one collection pass
+    replace a count_documents per number. "recent" is a separate find: the
+    createdAt index serves it directly, where inside $facet it would sort
+    the whole collection.
+    """
+    now = datetime.utcnow()
+    names = {"statuses", *facets}
+    pipeline = [{"$facet": {name: FACETS[name](now, top_limit) for name in names if name in FACETS}}]
+    result = next(db.issues.aggregate(pipeline), None) or {}
+
+    statuses = {state: 0 for state in ISSUE_STATES}
+    for row in result.get("statuses", []):
+        statuses[row["_id"]] = row["count"]
+    stats = {
+        "total": sum(statuses.values()),
+        "resolved": sum(statuses.get(state, 0) for state in RESOLVED_STATES),
+        "statuses": statuses,
+    }
+    if "categories" in names:
+        stats["categories"] = [{"category": row["_id"], "count": row["count"]} for row in result["categories"]]
+    if "windows" in names:
+        windows = (result["windows"] or [{}])[0]
+        stats["windows"] = {key: windows.get(key, 0) for key in ("today", "week", "month")}
+    if "resolution" in names:
+        resolution = result["resolution"]
+        stats["avgResolutionHours"] = resolution[0]["avgTime"] / (1000 * 60 * 60) if resolution and resolution[0]["avgTime"] else 0
+    if "topReporters" in names:
+        stats["topReporters"] = result["topReporters"]
+    if "recent" in names:
+        stats["recent"] = list(db.issues.find({}, RECENT_FIELDS).sort("createdAt", -1).limit(RECENT_LIMIT))
+    return stats
+
+
+def user_role_counts() -> dict:
+    """Users per role plus the total, in one aggregation."""
+    counts = {"citizen": 0, "worker": 0, "admin": 0}
+    for row in db.users.aggregate([{"$group": {"_id": "$role", "count": {"$sum": 1}}}]):
+        counts[row["_id"]] = row["count"]
+    counts["total"] = sum(counts.values())
+    return counts
@@ -0,0 +1,83 @@
+import csv
+import io
+import json
+import zlib
+
+from flask import Response, stream_with_context
+
+
+DEFAULT_CHUNK_SIZE = 500
+
+# Everything the public map and the recent-reports feed render
+MAP_FIELDS = {
+    "title": 1,
+    "category": 1,
+    "status": 1,
+    "location": 1,
+    "imageUrl": 1,
+    "createdAt": 1,
+}
+
+
+def map_point(doc: dict) -> dict:
+    created_at = doc.get("createdAt")
+    return {
+        "id": str(doc["_id"]),
+        "title": doc.get("title"),
+        "category": doc.get("category"),
+        "status": doc.get("status"),
+        "location": doc.get("location"),
+        "imageUrl": doc.get("imageUrl"),
+        "createdAt": created_at.isoformat() if created_at else None,
+    }
+
+
+def stream_json_array(cursor, serialize, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Response:
+    """Stream `cursor` to the client as a JSON array, `chunk_size` rows at a time.
+
+    Only one Mongo batch and one chunk of encoded rows are alive at once, so
+    memory stays flat and the first bytes leave before the query finishes.
+    `serialize` must return JSON-native values.
+    """
+    cursor = cursor.batch_size(chunk_size)
+
+    def generate():
+        yield "["
+        separator = ""
+        chunk = []
+        for doc in cursor:
+            chunk.append(json.dumps(serialize(doc), separators=(",", ":")))
+            if len(chunk) >= chunk_size:
+                yield separator + ",".join(chunk)
+                separator = ","
+                chunk = []
+        if chunk:
+            yield separator + ",".join(chunk)
+        yield "]"
+
+    return Response(stream_with_context(generate()), mimetype="application/json")
+
+
+def stream_csv(chunks, filename: str, compress: bool = False) -> Response:
+    """Stream CSV to the client as an attachment, one chunk of rows at a time.
+
+    `chunks` yields lists of rows and is consumed lazily, so only the chunk
+    being written is in memory. With `compress` the body is gzip
+    Content-Encoding, flushed after every chunk so rows still leave as they
+    are produced.
+    """
+    def generate():
+        gzip = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+        for rows in chunks:
+            buffer = io.StringIO()
+            csv.writer(buffer).writerows(rows)
+            data = buffer.getvalue().encode("utf-8")
+            yield gzip.compress(data) + gzip.flush(zlib.Z_SYNC_FLUSH) if gzip else data
+        if gzip:
+            yield gzip.flush()
+
+    headers = {"Content-Disposition": f"attachment;filename={filename}"}
+    if compress:
+        headers["Content-Encoding"] = "gzip"
+        headers["Vary"] = "Accept-Encoding"
+    return Response(stream_with_context(generate()), mimetype="text/csv", headers=headers)
@@ -0,0 +1,99 @@
+import math
+
+from bson import ObjectId
+from pymongo import UpdateOne
+
+from .. import db
+from .geo import EARTH_RADIUS_M, geo_point, haversine_m
+from .jobs import register_job
+
+
+# Sides of the polygon stored for each subscription circle
+CIRCLE_SIDES = 32
+
+# Users notified per insert_many when an issue matches many subscriptions
+FANOUT_BATCH = 1000
+
+
+def circle_polygon(lat: float, lng: float, radius_m: float, sides: int = CIRCLE_SIDES) -> dict:
+    """GeoJSON Polygon circumscribing the circle of `radius_m` around (lat, lng).
+
+    The polygon's edges touch the circle from outside, so it contains every
+    point of the circle; matches are then confirmed by exact distance.
+    """
+    outer = radius_m / math.cos(math.pi / sides)
+    delta = outer / EARTH_RADIUS_M
+    phi1, lambda1 = math.radians(lat), math.radians(lng)
+    ring = []
+    for k in range(sides):
+        bearing = 2 * math.pi * k / sides
+        phi2 = math.asin(math.sin(phi1) * math.cos(delta) + math.cos(phi1) * math.sin(delta) * math.cos(bearing))
+        lambda2 = lambda1 + math.atan2(
+            math.sin(bearing) * math.sin(delta) * math.cos(phi1),
+            math.cos(delta) - math.sin(phi1) * math.sin(phi2),
+        )
+        ring.append([math.degrees(lambda2), math.degrees(phi2)])
+    ring.append(ring[0])
+    return {"type": "Polygon", "coordinates": [ring]}
+
+
+def subscription_area(lat: float, lng: float, radius_km: float) -> dict:
+    """The indexed fields of a subscription: its center and its circle polygon."""
+    return {
+        "geo": geo_point({"lat": lat, "lng": lng}),
+        "area": circle_polygon(lat, lng, radius_km * 1000),
+    }
+
+
+def matching_subscribers(lat: float, lng: float, exclude: ObjectId = None) -> list:
+    """Users whose active subscription circle contains (lat, lng).
+
+    The 2dsphere index on ``area`` finds the circles containing the point,
+    so the cost follows the number of matches rather than the number of
+    subscriptions.
+    """
+    point = geo_point({"lat": lat, "lng": lng})
+    if point is None:
+        return []
+    query = {"active": True, "area": {"$geoIntersects": {"$geometry": point}}}
+    user_ids = []
+    for sub in db.area_subscriptions.find(query, {"userId": 1, "location": 1, "radius": 1}):
+        center = sub["location"]
+        if sub["userId"] != exclude and haversine_m(lat, lng, center["lat"], center["lng"]) <= sub["radius"] * 1000:
+            user_ids.append(sub["userId"])
+    return user_ids
+
+
+def notify_subscribers(issue_id: ObjectId, lat: float, lng: float, reporter_id: ObjectId, title: str, category: str):
+    """Job: tell every subscriber whose area covers a new issue about it."""
+    from ..routes.notifications import create_notifications
+
+    user_ids = matching_subscribers(lat, lng, exclude=reporter_id)
+    for start in range(0, len(user_ids), FANOUT_BATCH):
+        create_notifications(
+            user_ids[start:start + FANOUT_BATCH],
+            "info",
+            "New Issue In Your Area",
+            f"'{title}' ({category}) was reported near you",
+        )
+
+
+register_job("area_match", notify_subscribers)
+
+
+def migrate_subscription_areas(chunk_size: int = 1000) -> int:
+    """Backfill ``geo`` and ``area`` on subscriptions stored before they existed."""
+    migrated = 0
+    operations = []
+    for sub in db.area_subscriptions.find({"area": {"$exists": False}}, {"location": 1, "radius": 1}):
+        location = sub.get("location") or {}
+        if geo_point(location) is None:
+            continue
+        fields = subscription_area(location["lat"], location["lng"], sub.get("radius", 5))
+        operations.append(UpdateOne({"_id": sub["_id"]}, {"$set": fields}))
+        if len(operations) >= chunk_size:
+            migrated += db.area_subscriptions.bulk_write(operations, ordered=False).modified_count
+            operations = []
+    if operations:
+        migrated += db.area_subscriptions.bulk_write(operations, ordered=False).modified_count
+    return migrated
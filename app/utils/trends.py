@@ -0,0 +1,142 @@
+from datetime import date, datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+from pymongo import DeleteOne, ReplaceOne, UpdateOne
+
+from .. import db
+from .lifecycle import add_listener
+
+
+GRANULARITIES = ("day", "week", "month")
+
+_settings = {"timezone": ZoneInfo("UTC")}
+
+
+def init_trends(app):
+    _settings["timezone"] = ZoneInfo(app.config["CITY_TIMEZONE"])
+
+
+def local_day(moment: datetime) -> str:
+    """City-local calendar day ("YYYY-MM-DD") of a naive UTC datetime."""
+    return moment.replace(tzinfo=timezone.utc).astimezone(_settings["timezone"]).date().isoformat()
+
+
+def local_today() -> date:
+    return datetime.now(_settings["timezone"]).date()
+
+
+def _count(issue: dict, status: str, delta: int):
+    """$inc of the daily_counts row (local creation day, category, status) of `issue`."""
+    created_at = issue.get("createdAt")
+    if not isinstance(created_at, datetime):
+        return None
+    day, category = local_day(created_at), issue.get("category")
+    return UpdateOne(
+        {"_id": f"{day}|{category}|{status}"},
+        {"$inc": {"count": delta}, "$setOnInsert": {"day": day, "category": category, "status": status}},
+        upsert=True,
+    )
+
+
+def _apply(*operations):
+    operations = [op for op in operations if op is not None]
+    if operations:
+        db.daily_counts.bulk_write(operations, ordered=False)
+
+
+def add_issue(issue: dict):
+    _apply(_count(issue, issue.get("status"), 1))
+
+
+def move_issue(before: dict, after: dict):
+    """Move an issue between status rows when its status changes."""
+    if before.get("status") != after.get("status"):
+        _apply(_count(before, before.get("status"), -1), _count(after, after.get("status"), 1))
+
+
+def remove_issue(issue: dict):
+    _apply(_count(issue, issue.get("status"), -1))
+
+
+add_listener("created", add_issue)
+add_listener("transitioned", move_issue)
+add_listener("deleted", remove_issue)
+
+
+def rebuild_daily_counts(chunk_size: int = 1000) -> int:
+    """Recompute daily_counts from the issues collection; returns the number of rows.
+
+    The grouping runs in MongoDB with the city timezone, so the backfill
+    agrees with the days the listeners compute. Rows are replaced in place
+    and only keys that existed before the rebuild and no longer occur are
+    deleted, so readers never see an empty rollup and rows the listeners
+    create meanwhile are kept.
+    """
+    existing = {doc["_id"] for doc in db.daily_counts.find({}, {"_id": 1})}
+    pipeline = [
+        {"$match": {"createdAt": {"$type": "date"}}},
+        {
+            "$group": {
+                "_id": {
+                    "day": {
+                        "$dateToString": {
+                            "format": "%Y-%m-%d",
+                            "date": "$createdAt",
+                            "timezone": _settings["timezone"].key,
+                        }
+                    },
+                    "category": "$category",
+                    "status": "$status",
+                },
+                "count": {"$sum": 1},
+            }
+        },
+    ]
+    operations = []
+    for row in db.issues.aggregate(pipeline, allowDiskUse=True):
+        key = row["_id"]
+        row_id = f"{key['day']}|{key.get('category')}|{key.get('status')}"
+        existing.discard(row_id)
+        operations.append(ReplaceOne({"_id": row_id}, {
+            "day": key["day"],
+            "category": key.get("category"),
+            "status": key.get("status"),
+            "count": row["count"],
+        }, upsert=True))
+    operations += [DeleteOne({"_id": row_id}) for row_id in existing]
+
+    for start in range(0, len(operations), chunk_size):
+        db.daily_counts.bulk_write(operations[start:start + chunk_size], ordered=False)
+    return len(operations) - len(existing)
+
+
+def _bucket(day: str, granularity: str) -> str:
+    if granularity == "month":
+        return day[:7]
+    if granularity == "week":
+        parsed = date.fromisoformat(day)
+        return (parsed - timedelta(days=parsed.weekday())).isoformat()  # ISO weeks start on Monday
+    return day
+
+
+def issue_trends(days: int, granularity: str = "day", category: str = None, status: str = None) -> list:
+    """Issues reported per day, week (keyed by its Monday) or month over the last `days` local days.
+
+    Read from the daily_counts rollup, so the cost depends on the number
+    of days in the window rather than the number of issues.
+    """
+    match = {"day": {"$gte": (local_today() - timedelta(days=days)).isoformat()}}
+    if category:
+        match["category"] = category
+    if status:
+        match["status"] = status
+    pipeline = [
+        {"$match": match},
+        {"$group": {"_id": "$day", "count": {"$sum": "$count"}}},
+        {"$sort": {"_id": 1}},
+    ]
+    buckets = {}
+    for row in db.daily_counts.aggregate(pipeline):
+        key = _bucket(row["_id"], granularity)
+        buckets[key] = buckets.get(key, 0) + row["count"]
+    return [{"date": key, "count": count} for key, count in buckets.items() if count > 0]
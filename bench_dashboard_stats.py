@@ -0,0 +1,153 @@
+"""
+Benchmark for the admin dashboard statistics
+Compares the per-number count_documents queries the dashboard used to run
+with the single $facet aggregation (app/utils/stats.py), on a generated
+database of --issues issues.
+
+Usage:
+    python bench_dashboard_stats.py [--issues 1000000] [--users 10000] [--runs 5] [--db urban_pulse_bench]
+
+The benchmark database is (re)generated when its issue count differs from
+--issues and is left in place for the next run; never point --db at real data.
+"""
+
+import argparse
+import os
+import random
+import statistics
+import time
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+from pymongo import monitoring
+
+CATEGORIES = ["Water Leakage", "Garbage Dump", "Pothole", "Broken Streetlight", "Traffic Signal"]
+STATES = ["REPORTED", "VERIFIED", "ASSIGNED", "IN_PROGRESS", "RESOLVED", "CLOSED"]
+
+
+class CommandCounter(monitoring.CommandListener):
+    """Counts the commands (round trips) sent to the server."""
+
+    def __init__(self):
+        self.count = 0
+
+    def started(self, event):
+        self.count += 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+def generate(db, issues: int, users: int, batch: int = 10000):
+    print(f"Generating {users:,} users and {issues:,} issues...")
+    db.users.delete_many({})
+    db.issues.delete_many({})
+    roles = ["citizen"] * 90 + ["worker"] * 9 + ["admin"]
+    user_ids = []
+    for start in range(0, users, batch):
+        docs = [
+            {"_id": ObjectId(), "name": f"User {i}", "email": f"user{i}@bench.local", "role": random.choice(roles), "points": random.randint(0, 500)}
+            for i in range(start, min(start + batch, users))
+        ]
+        db.users.insert_many(docs, ordered=False)
+        user_ids.extend(doc["_id"] for doc in docs)
+
+    now = datetime.utcnow()
+    for start in range(0, issues, batch):
+        docs = []
+        for _ in range(min(batch, issues - start)):
+            created = now - timedelta(minutes=random.randint(0, 60 * 24 * 365 * 2))
+            docs.append({
+                "title": "Benchmark issue",
+                "category": random.choice(CATEGORIES),
+                "status": random.choice(STATES),
+                "location": {"lat": 12.9 + random.random(), "lng": 77.5 + random.random()},
+                "reportedBy": random.choice(user_ids),
+                "createdAt": created,
+                "updatedAt": created + timedelta(hours=random.randint(1, 500)),
+            })
+        db.issues.insert_many(docs, ordered=False)
+        print(f"  {start + len(docs):,} issues", end="\r")
+    print()
+
+
+def legacy_dashboard_stats(db):
+    """The dashboard-stats queries as they were before the $facet pipeline."""
+    now = datetime.utcnow()
+    today_start = datetime(now.year, now.month, now.day)
+    db.issues.count_documents({})
+    db.users.count_documents({})
+    db.users.count_documents({"role": "citizen"})
+    db.users.count_documents({"role": "worker"})
+    for status in STATES:
+        db.issues.count_documents({"status": status})
+    list(db.issues.aggregate([{"$group": {"_id": "$category", "count": {"$sum": 1}}}, {"$sort": {"count": -1}}]))
+    db.issues.count_documents({"createdAt": {"$gte": today_start}})
+    db.issues.count_documents({"createdAt": {"$gte": now - timedelta(days=7)}})
+    db.issues.count_documents({"createdAt": {"$gte": now - timedelta(days=30)}})
+    db.issues.count_documents({"status": {"$in": ["RESOLVED", "CLOSED"]}})
+    list(db.issues.aggregate([
+        {"$match": {"status": {"$in": ["RESOLVED", "CLOSED"]}}},
+        {"$project": {"resolutionTime": {"$subtract": ["$updatedAt", "$createdAt"]}}},
+        {"$group": {"_id": None, "avgTime": {"$avg": "$resolutionTime"}}},
+    ]))
+    top = list(db.issues.aggregate([
+        {"$group": {"_id": "$reportedBy", "count": {"$sum": 1}}},
+        {"$sort": {"count": -1}},
+        {"$limit": 5},
+    ]))
+    for item in top:
+        db.users.find_one({"_id": item["_id"]})
+
+
+def facet_dashboard_stats(db):
+    from app.utils.stats import issue_stats, user_role_counts
+
+    issue_stats(["categories", "windows", "resolution", "topReporters"])
+    user_role_counts()
+
+
+def measure(name: str, fn, db, counter: CommandCounter, runs: int):
+    fn(db)  # warm the cache
+    timings = []
+    for _ in range(runs):
+        counter.count = 0
+        started = time.perf_counter()
+        fn(db)
+        timings.append((time.perf_counter() - started) * 1000)
+    print(f"{name:<16} round trips {counter.count:>3}   median {statistics.median(timings):>9.1f} ms   min {min(timings):>9.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--issues", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--db", default="urban_pulse_bench", help="Database to generate and query")
+    args = parser.parse_args()
+
+    os.environ["MONGO_DB_NAME"] = args.db
+    os.environ["JOBS_MODE"] = "inline"
+    counter = CommandCounter()
+    monitoring.register(counter)  # applies to clients created from here on
+
+    from app import create_app
+    from create_indexes import create_indexes
+
+    create_app()
+    from app import db
+
+    if db.issues.estimated_document_count() != args.issues:
+        generate(db, args.issues, args.users)
+        create_indexes()
+
+    print(f"\n{args.issues:,} issues, {args.runs} runs each")
+    measure("count_documents", legacy_dashboard_stats, db, counter, args.runs)
+    measure("$facet", facet_dashboard_stats, db, counter, args.runs)
+
+
+if __name__ == "__main__":
+    main()
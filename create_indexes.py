@@ -3,7 +3,7 @@ Database index creation script for performance optimization
 Run this after initial setup to create indexes on frequently queried fields
 """
 
-from pymongo import MongoClient, ASCENDING, DESCENDING, TEXT, GEO2D
+from pymongo import MongoClient, ASCENDING, DESCENDING, TEXT, GEO2D, GEOSPHERE
 import os
 from dotenv import load_dotenv
 
@@ -40,6 +40,8 @@ def create_indexes():
         ("location.lat", ASCENDING),
         ("location.lng", ASCENDING)
     ])
+    # GeoJSON point [lng, lat] for $geoNear / $geoWithin (see maintenance.py migrate-geo)
+    db.issues.create_index([("geo", GEOSPHERE)])
     
     # Text search index
     db.issues.create_index([
@@ -51,12 +53,22 @@ def create_indexes():
     # Compound indexes for common queries
     db.issues.create_index([("status", ASCENDING), ("createdAt", DESCENDING)])
     db.issues.create_index([("category", ASCENDING), ("status", ASCENDING)])
+
+    # Keyset pagination: newest-first on (createdAt|updatedAt, _id)
+    db.issues.create_index([("createdAt", DESCENDING), ("_id", DESCENDING)])
+    db.issues.create_index([("reportedBy", ASCENDING), ("createdAt", DESCENDING), ("_id", DESCENDING)])
+    db.issues.create_index([("assignedTo", ASCENDING), ("updatedAt", DESCENDING), ("_id", DESCENDING)])
+    db.issues.create_index([("status", ASCENDING), ("assignedTo", ASCENDING), ("createdAt", DESCENDING), ("_id", DESCENDING)])
     
     # Notifications collection
     print("  - notifications indexes")
     db.notifications.create_index([("userId", ASCENDING), ("createdAt", DESCENDING)])
     db.notifications.create_index([("userId", ASCENDING), ("read", ASCENDING)])
     db.notifications.create_index([("createdAt", DESCENDING)])
+    # Job id + recipient: a notification job that runs twice inserts once
+    db.notifications.create_index(
+        [("dedupeKey", ASCENDING)], unique=True, partialFilterExpression={"dedupeKey": {"$exists": True}}
+    )
     
     # Comments collection
     print("  - comments indexes")
@@ -76,8 +88,46 @@ def create_indexes():
     
     # Impact metrics collection
     print("  - impact_metrics indexes")
-    db.impact_metrics.create_index([("issueId", ASCENDING)])
+    # One row per issue: persist_impact upserts on issueId so a retried job counts once.
+    # Older double closes may have left duplicates; keep the first row of each issue.
+    duplicates = db.impact_metrics.aggregate([
+        {"$group": {"_id": "$issueId", "ids": {"$push": "$_id"}, "count": {"$sum": 1}}},
+        {"$match": {"count": {"$gt": 1}}},
+    ], allowDiskUse=True)
+    removed = 0
+    for group in duplicates:
+        removed += db.impact_metrics.delete_many({"_id": {"$in": sorted(group["ids"])[1:]}}).deleted_count
+    if removed:
+        print(f"    removed {removed} duplicate impact rows; run maintenance.py reconcile-aggregates,")
+        print("    rebuild-monthly and repair-user-impact to recount the rollups")
+    # Built under its own name so the plain index is only dropped once this one exists
+    db.impact_metrics.create_index([("issueId", ASCENDING)], unique=True, name="issueId_unique")
+    if "issueId_1" in db.impact_metrics.index_information():
+        db.impact_metrics.drop_index("issueId_1")
     db.impact_metrics.create_index([("createdAt", DESCENDING)])
+    db.impact_metrics.create_index([("userId", ASCENDING)])
+
+    # Area subscriptions: one per user, matched by the circle containing an issue
+    print("  - area_subscriptions indexes")
+    db.area_subscriptions.create_index([("userId", ASCENDING)], unique=True)
+    db.area_subscriptions.create_index([("area", GEOSPHERE), ("active", ASCENDING)])
+
+    # Daily trend rollup, read by day range
+    print("  - daily_counts indexes")
+    db.daily_counts.create_index([("day", ASCENDING)])
+
+    # Multi-resolution map grid, read by level and cell range
+    print("  - map_grid indexes")
+    db.map_grid.create_index([("level", ASCENDING), ("x", ASCENDING), ("y", ASCENDING)])
+
+    # Precomputed hotspot clusters, read newest run first
+    print("  - hotspots indexes")
+    db.hotspots.create_index([("profile", ASCENDING), ("computedAt", DESCENDING)])
+    db.hotspots.create_index([("profile", ASCENDING), ("runId", ASCENDING), ("rank", ASCENDING)])
+
+    # Spilled background jobs, reclaimed oldest first
+    print("  - job_spill indexes")
+    db.job_spill.create_index([("failed", ASCENDING), ("createdAt", ASCENDING)])
     
     print("\n✅ All indexes created successfully!")
     print("\nIndexes created:")
@@ -0,0 +1,148 @@
+"""
+Maintenance commands for Urban Pulse
+Rebuild derived data (aggregates, rollups) from the source collections
+
+Usage:
+    python maintenance.py reconcile-aggregates
+    python maintenance.py recompute-impact [--chunk-size N] [--stale-only]
+    python maintenance.py rebuild-monthly
+    python maintenance.py repair-user-impact [--dry-run]
+    python maintenance.py publish-impact-model FILE
+    python maintenance.py migrate-geo [--chunk-size N]
+    python maintenance.py compute-hotspots
+    python maintenance.py rebuild-map-grid
+    python maintenance.py backfill-daily-counts
+"""
+
+import argparse
+import json
+import os
+
+
+def reconcile_aggregates(args):
+    from app.utils.impact_engine import rebuild_global_aggregates
+
+    totals = rebuild_global_aggregates()
+    print("✓ Global aggregates rebuilt from impact_metrics")
+    for key, value in totals.items():
+        if key != "updatedAt":
+            print(f"  {key}: {value}")
+
+
+def recompute_impact(args):
+    from app.utils.impact_batch import recompute_impacts
+
+    result = recompute_impacts(chunk_size=args.chunk_size, stale_only=args.stale_only)
+    print(f"✓ Recomputed impact for {result['recomputed']} closed issues (model {result['modelVersion']})")
+
+
+def add_recompute_args(parser):
+    parser.add_argument("--chunk-size", type=int, default=5000, help="Closed issues per batch")
+    parser.add_argument("--stale-only", action="store_true", help="Only issues computed by an older model version")
+
+
+def rebuild_monthly(args):
+    from app.utils.impact_engine import rebuild_monthly_impact
+
+    months = rebuild_monthly_impact()
+    print(f"✓ impact_monthly rebuilt ({months} months)")
+
+
+def repair_user_impact(args):
+    from app.utils.impact_engine import repair_user_impact as repair
+
+    result = repair(dry_run=args.dry_run)
+    verb = "need repair" if args.dry_run else "repaired"
+    print(f"✓ Checked {result['checked']} users, {result['repaired']} {verb}")
+
+
+def add_repair_args(parser):
+    parser.add_argument("--dry-run", action="store_true", help="Only report users whose totals drifted")
+
+
+def publish_model(args):
+    from app.utils.impact_models import publish_impact_model
+
+    with open(args.file, encoding="utf-8") as f:
+        version = publish_impact_model(json.load(f))
+    print(f"✓ Published impact model {version}")
+    print("  Running app processes pick it up within IMPACT_MODEL_RELOAD_INTERVAL seconds")
+
+
+def add_publish_args(parser):
+    parser.add_argument("file", help="JSON model document with version and categories")
+
+
+def migrate_geo(args):
+    from app.utils.geo import migrate_issue_geo
+    from app.utils.subscriptions import migrate_subscription_areas
+
+    result = migrate_issue_geo(chunk_size=args.chunk_size)
+    print(f"✓ Added geo points to {result['migrated']} issues ({result['skipped']} without a valid location)")
+    migrated = migrate_subscription_areas(chunk_size=args.chunk_size)
+    print(f"✓ Added areas to {migrated} area subscriptions")
+
+
+def add_migrate_geo_args(parser):
+    parser.add_argument("--chunk-size", type=int, default=1000, help="Issues per bulk write")
+
+
+def compute_hotspots(args):
+    from app.utils.hotspots import refresh_hotspots
+
+    summary = refresh_hotspots()
+    if summary is None:
+        print("✗ Another process is computing hotspots; try again later")
+        return
+    for profile, count in summary.items():
+        print(f"✓ {profile}: {count} hotspots")
+
+
+def rebuild_map_grid(args):
+    from app.utils.map_grid import rebuild_map_grid as rebuild
+
+    cells = rebuild()
+    print(f"✓ map_grid rebuilt ({cells} cells)")
+
+
+def backfill_daily_counts(args):
+    from app.utils.trends import rebuild_daily_counts
+
+    rows = rebuild_daily_counts()
+    print(f"✓ daily_counts rebuilt ({rows} day/category/status rows)")
+
+
+COMMANDS = {
+    "reconcile-aggregates": (reconcile_aggregates, "Rebuild global impact totals from impact_metrics", None),
+    "recompute-impact": (recompute_impact, "Recompute impact_metrics for closed issues", add_recompute_args),
+    "rebuild-monthly": (rebuild_monthly, "Rebuild the impact_monthly rollup from impact_metrics", None),
+    "repair-user-impact": (repair_user_impact, "Verify per-user impact totals against impact_metrics", add_repair_args),
+    "publish-impact-model": (publish_model, "Publish a new impact model version", add_publish_args),
+    "migrate-geo": (migrate_geo, "Backfill GeoJSON fields on existing issues and area subscriptions", add_migrate_geo_args),
+    "compute-hotspots": (compute_hotspots, "Recompute hotspot clusters for every profile", None),
+    "rebuild-map-grid": (rebuild_map_grid, "Rebuild the clustered map grid from issues", None),
+    "backfill-daily-counts": (backfill_daily_counts, "Rebuild the daily_counts trend rollup from issues", None),
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Urban Pulse maintenance commands")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    for name, (handler, help_text, add_args) in COMMANDS.items():
+        subparser = subparsers.add_parser(name, help=help_text)
+        if add_args:
+            add_args(subparser)
+        subparser.set_defaults(handler=handler)
+    args = parser.parse_args()
+
+    # Run side-effect jobs in this process instead of on background threads
+    os.environ.setdefault("JOBS_MODE", "inline")
+    from app import create_app
+
+    app = create_app()
+    with app.app_context():
+        args.handler(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -31,6 +31,9 @@ def seed():
     db.notifications.delete_many({})
     db.comments.delete_many({})
     db.votes.delete_many({})
+    db.hotspots.delete_many({})  # recomputed from the new issues on the next request
+    # Issues are replaced wholesale: invalidate the map ETags clients hold
+    db.counters.update_one({"_id": "issues"}, {"$inc": {"version": 1}}, upsert=True)
 
     print("Creating users...")
     # Admin
@@ -120,6 +123,7 @@ def seed():
             "category": item["cat"],
             "imageUrl": f"https://picsum.photos/seed/{idx}/400/300" if idx % 3 == 0 else None,
             "location": {"lat": lat, "lng": lng, "address": f"Location {idx}, Bangalore"},
+            "geo": {"type": "Point", "coordinates": [lng, lat]},
             "sdgTags": [11, 6] if "Water" in item["cat"] else [11],
             "impactType": "water" if "Water" in item["cat"] else "waste" if "Garbage" in item["cat"] else "safety",
             "status": item["status"],
@@ -213,10 +217,30 @@ def seed():
                 "createdAt": datetime.utcnow() - timedelta(hours=random.randint(1, 72))
             })
 
+    print("Rebuilding derived collections...")
+    rebuild_rollups()
+
     print("Seed complete! Users created:")
     print("Admin: admin@urbanpulse.local / admin123")
     print("Worker: worker1@urbanpulse.local / worker123")
     print("Citizen: citizen@urbanpulse.local / citizen123")
 
+def rebuild_rollups():
+    """Recompute the rollups the app keeps incrementally, which the raw inserts above bypass."""
+    os.environ.setdefault("JOBS_MODE", "inline")
+    from app import create_app
+
+    app = create_app()
+    from app.utils.impact_engine import rebuild_monthly_impact, repair_user_impact
+    from app.utils.map_grid import rebuild_map_grid
+    from app.utils.trends import rebuild_daily_counts
+
+    with app.app_context():
+        print(f"  daily_counts: {rebuild_daily_counts()} rows")
+        print(f"  map_grid: {rebuild_map_grid()} cells")
+        print(f"  impact_monthly: {rebuild_monthly_impact()} months")
+        print(f"  user_impact: {repair_user_impact()['checked']} users")
+
+
 if __name__ == "__main__":
     seed()